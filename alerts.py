@@ -0,0 +1,325 @@
+"""
+Streaming alert rules for sensor readings.
+
+Each new metrics dict (see monitor.build_metrics) is checked once against
+RULES, in O(1) per rule: rules only look at the reading and a few values of
+per-sensor state (previous value, streak counts, when an alert last went
+out), never at history. That state is persisted compactly to
+ALERT_STATE_FILE, so rate-of-change and sustained rules carry on across
+restarts. Fleet shards share the file: each merges only the sensors it
+evaluated into it, and picks up the others' when another shard rewrote it.
+
+Three kinds of rule:
+
+    Threshold     value outside a range
+    RateOfChange  value moved more than max_delta since the previous reading
+    Sustained     a condition held for `readings` consecutive readings
+
+A threshold or sustained alert that stays active is repeated at most every
+ALERT_REPEAT_MINUTES; rate-of-change alerts go out on every jump.
+
+Delivery is handed to a background worker through a bounded queue, so a slow
+sink never holds up the scrape loop. Sinks are picked with ALERT_SINKS
+(comma-separated names in SINKS); a full queue drops alerts rather than block.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+
+from lease import FileLock, file_signature
+
+ALERT_LOG = os.getenv("ALERT_LOG", "alerts.log")
+ALERT_STATE_FILE = os.getenv("ALERT_STATE_FILE", "alert_state.json")
+ALERT_REPEAT_MINUTES = float(os.getenv("ALERT_REPEAT_MINUTES", "60"))
+ALERT_SINKS = os.getenv("ALERT_SINKS", "log,console")
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")
+ALERT_QUEUE_SIZE = 1000
+
+Alert = namedtuple('Alert', ['timestamp', 'sensor', 'rule', 'title', 'message'])
+
+
+# -------- RULES --------
+
+class Threshold:
+    repeats_while_active = False
+
+    def __init__(self, name, metric, title, message, below=None, above=None):
+        self.name = name
+        self.metric = metric
+        self.title = title
+        self.message = message
+        self.below = below
+        self.above = above
+
+    def check(self, value, state):
+        if (self.below is not None and value < self.below) or \
+                (self.above is not None and value > self.above):
+            return self.message.format(value=value)
+        return None
+
+
+class RateOfChange:
+    # Every large jump is news, even straight after another one
+    repeats_while_active = True
+
+    def __init__(self, name, metric, title, message, max_delta):
+        self.name = name
+        self.metric = metric
+        self.title = title
+        self.message = message
+        self.max_delta = max_delta
+
+    def check(self, value, state):
+        prev = state['prev'].get(self.metric)
+        if prev is not None and abs(value - prev) >= self.max_delta:
+            return self.message.format(value=value, prev=prev, delta=value - prev)
+        return None
+
+
+class Sustained:
+    """Fires once `rule` has matched `readings` readings in a row"""
+
+    repeats_while_active = False
+
+    def __init__(self, name, rule, readings):
+        self.name = name
+        self.metric = rule.metric
+        self.title = rule.title
+        self.rule = rule
+        self.readings = readings
+
+    def check(self, value, state):
+        message = self.rule.check(value, state)
+        streak = state['streak'].get(self.name, 0) + 1 if message else 0
+        if streak:
+            state['streak'][self.name] = streak
+        else:
+            state['streak'].pop(self.name, None)
+        return message if streak >= self.readings else None
+
+
+RULES = [
+    Threshold('temp_critical', 'temperature_c', 'Temperature Critical',
+              'Temperature {value:.1f} °C is unsafe (safe range 10.0-38.0).', below=10.0, above=38.0),
+    Sustained('low_moisture', Threshold(
+        'moisture_low', 'moisture_pct', 'Low Moisture',
+        'Moisture is {value:.1f}% (< 35.0%). Watering needed.', below=35.0), readings=2),
+    Threshold('moisture_critical', 'moisture_pct', 'Moisture Critical',
+              'Moisture {value:.1f}% is unsafe. Action required immediately.', below=15.0, above=85.0),
+    Threshold('moisture_warning', 'moisture_pct', 'Moisture Warning',
+              'Moisture {value:.1f}% is suboptimal. Consider adjusting.', below=35.0, above=80.0),
+    Threshold('ec_critical', 'ec_us_cm', 'EC Critical',
+              'EC {value:.0f} µS/cm is outside safe range.', below=100.0, above=4500.0),
+    Threshold('ec_range', 'ec_us_cm', 'EC Out of Range',
+              'EC {value:.0f} µS/cm is suboptimal (600-3000 recommended).', below=600.0, above=3000.0),
+    Threshold('ph_critical', 'acidity_ph', 'Acidity Critical',
+              'pH {value:.2f} is unsafe (safe range 4.5-8.5).', below=4.5, above=8.5),
+    Threshold('ph_warning', 'acidity_ph', 'Acidity Warning',
+              'pH {value:.2f} is suboptimal (5.5-7.5 recommended).', below=5.5, above=7.5),
+    RateOfChange('moisture_change', 'moisture_pct', 'Moisture Drastic Change',
+                 'Moisture changed by {delta:+.1f}% (prev {prev:.1f}%).', max_delta=20.0),
+    RateOfChange('ec_change', 'ec_us_cm', 'EC Drastic Change',
+                 'Conductivity changed by {delta:+.0f} µS/cm (prev {prev:.0f}).', max_delta=500.0),
+    RateOfChange('ph_change', 'acidity_ph', 'Acidity Drastic Change',
+                 'pH changed by {delta:+.2f} (prev {prev:.2f}).', max_delta=0.5),
+]
+
+# Within a metric, a more severe alert suppresses the milder ones listed after it
+SUPERSEDES = {
+    'moisture_critical': ['moisture_warning'],
+    'ec_critical': ['ec_range'],
+    'ph_critical': ['ph_warning'],
+}
+
+
+# -------- SINKS --------
+
+class LogFileSink:
+    """Append to alerts.log as `[YYYY-MM-DD HH:MM:SS] Title - message`"""
+
+    def __init__(self, path=ALERT_LOG):
+        self.path = path
+
+    def send(self, alert):
+        stamp = datetime.fromtimestamp(alert.timestamp).strftime('%Y-%m-%d %H:%M:%S')
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(f"[{stamp}] {alert.title} - {alert.message}\n")
+
+
+class ConsoleSink:
+    def send(self, alert):
+        print(f"🚨 {alert.sensor}: {alert.title} - {alert.message}")
+
+
+class WebhookSink:
+    """POST each alert as JSON to ALERT_WEBHOOK_URL"""
+
+    def __init__(self, url=ALERT_WEBHOOK_URL):
+        self.url = url
+
+    def send(self, alert):
+        if self.url:
+            requests.post(self.url, json=alert._asdict(), timeout=10)
+
+
+SINKS = {
+    'log': LogFileSink,
+    'console': ConsoleSink,
+    'webhook': WebhookSink,
+}
+
+
+class AlertDispatcher:
+    """Delivers alerts to every sink from a worker thread"""
+
+    def __init__(self, sinks, queue_size=ALERT_QUEUE_SIZE):
+        self.sinks = sinks
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, alert):
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            alert = self._queue.get()
+            try:
+                if alert is None:
+                    return
+                for sink in self.sinks:
+                    try:
+                        sink.send(alert)
+                    except Exception as e:
+                        print(f"⚠️  Alert delivery via {type(sink).__name__} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def close(self, timeout=5):
+        """Deliver what is queued (waiting at most timeout seconds) and stop the worker"""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+def open_sinks(names=ALERT_SINKS):
+    sinks = []
+    for name in filter(None, (n.strip() for n in names.split(","))):
+        if name not in SINKS:
+            raise ValueError(f"Unknown alert sink {name!r} (expected one of: {', '.join(SINKS)})")
+        sinks.append(SINKS[name]())
+    return sinks
+
+
+# -------- ENGINE --------
+
+class AlertEngine:
+    def __init__(self, dispatcher, rules=RULES, state_file=ALERT_STATE_FILE,
+                 repeat_seconds=ALERT_REPEAT_MINUTES * 60, clock=time.time):
+        self.dispatcher = dispatcher
+        self.rules = rules
+        self.state_file = state_file
+        self.repeat_seconds = repeat_seconds
+        self.clock = clock
+        self.fired = 0
+        self._state = {}
+        # Sensors evaluated since the last save
+        self._dirty = set()
+        self._signature = None
+        self._refresh()
+
+    def _load(self):
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def _refresh(self):
+        """Re-read the state file if another process replaced it, keeping unsaved sensors"""
+        signature = file_signature(self.state_file)
+        if signature == self._signature:
+            return
+        state = self._load()
+        for sensor in self._dirty:
+            state[sensor] = self._state[sensor]
+        self._state = state
+        self._signature = signature
+
+    def _sensor_state(self, sensor):
+        state = self._state.setdefault(sensor, {})
+        for key in ('prev', 'streak', 'active'):
+            state.setdefault(key, {})
+        return state
+
+    def evaluate(self, sensor, metrics):
+        """Check one reading against every rule; returns the alerts sent"""
+        now = self.clock()
+        self._refresh()
+        state = self._sensor_state(sensor)
+        active = state['active']
+        matched = {}
+        for rule in self.rules:
+            value = metrics.get(rule.metric)
+            if value is None:
+                continue
+            message = rule.check(value, state)
+            if message:
+                matched[rule.name] = (rule, message)
+
+        for name in SUPERSEDES:
+            if name in matched:
+                for milder in SUPERSEDES[name]:
+                    matched.pop(milder, None)
+
+        sent = []
+        for name, (rule, message) in matched.items():
+            last = active.get(name)
+            if last is None or rule.repeats_while_active or now - last >= self.repeat_seconds:
+                active[name] = now
+                alert = Alert(now, sensor, name, rule.title, message)
+                self.dispatcher.submit(alert)
+                sent.append(alert)
+        # Conditions that cleared can fire again straight away next time
+        for name in [n for n in active if n not in matched]:
+            del active[name]
+
+        for key, value in metrics.items():
+            if value is not None:
+                state['prev'][key] = value
+        self.fired += len(sent)
+        self._dirty.add(sensor)
+        return sent
+
+    def format_stats(self):
+        return f"{self.fired} sent, {self.dispatcher.dropped} dropped (queue full)"
+
+    def save(self):
+        """Merge the sensors evaluated since the last save into the state file"""
+        if not self._dirty:
+            return
+        with FileLock(self.state_file + ".lock"):
+            state = self._load()
+            for sensor in self._dirty:
+                state[sensor] = self._state[sensor]
+            tmp = self.state_file + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(state, f, separators=(",", ":"))
+            os.replace(tmp, self.state_file)
+            self._signature = file_signature(self.state_file)
+        self._state = state
+        self._dirty = set()
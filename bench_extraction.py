@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""
+Extraction benchmark and regression corpus.
+
+Runs extract_parameters -> build_metrics over the captured dashboard texts
+plus synthetic variants ("No data" / "Field not found" panels, very large
+pages), checks the metrics against bench_expected.json and reports
+throughput, per-stage latency and memory per page. Allocation counts come
+from memray (`pip install memray`) when it is installed.
+
+    python bench_extraction.py                  # check + benchmark
+    python bench_extraction.py --update         # re-record expected outputs
+    python bench_extraction.py --min-pps 2000   # also fail below a throughput floor
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import memray
+except ImportError:  # optional, only needed for allocation counts
+    memray = None
+
+from monitor import extract_parameters, build_metrics, index_page_text, EXTRACTORS
+
+CAPTURED_FILES = [
+    "debug_sensor_1_raw.txt",
+    "debug_sensor_2_raw.txt",
+    "sensor1_text.txt",
+    "sensor2_text.txt",
+]
+EXPECTED_FILE = "bench_expected.json"
+
+# A panel value line: number with a unit, or a bare decimal like the pH panel
+VALUE_LINE_RE = re.compile(r'^\s*\d+(?:\.\d+)?\s*(?:°C|%|[µuμ]S/cm|mg/L|V)?\s*$', re.MULTILINE)
+
+
+# -------- CORPUS --------
+
+def _read(name):
+    with open(name, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def build_corpus():
+    """Ordered list of (case_name, page_text)"""
+    corpus = []
+    captured = [(os.path.splitext(f)[0], _read(f)) for f in CAPTURED_FILES if os.path.exists(f)]
+    corpus.extend(captured)
+
+    for name, text in captured:
+        corpus.append((f"{name}+no_data", VALUE_LINE_RE.sub("No data", text)))
+        corpus.append((f"{name}+field_not_found", VALUE_LINE_RE.sub("Field not found", text)))
+        # A dashboard with many rows of panels: the same layout repeated
+        corpus.append((f"{name}+large", "\n".join([text] * 50)))
+
+    if captured:
+        # One very large page mixing every capture with filler panels
+        filler = "\n".join(f"Panel {i}\nLast 24 hours\nRefresh" for i in range(500))
+        corpus.append(("mixed+huge", filler + "\n" + "\n".join(t for _, t in captured) * 20))
+
+    return corpus
+
+
+def run_case(text):
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = extract_parameters(text)
+    metrics = build_metrics(results)
+    metrics["_data_quality"] = results["_data_quality"]
+    return metrics
+
+
+# -------- REGRESSION CHECK --------
+
+def check_expected(corpus, expected):
+    failures = []
+    for name, text in corpus:
+        if name not in expected:
+            failures.append(f"{name}: no expected output recorded (run with --update)")
+            continue
+        got = run_case(text)
+        if got != expected[name]:
+            diff = {k: (expected[name].get(k), v) for k, v in got.items() if expected[name].get(k) != v}
+            failures.append(f"{name}: expected -> got {diff}")
+    return failures
+
+
+# -------- BENCHMARK --------
+
+def bench_throughput(corpus, repeat):
+    texts = [t for _, t in corpus]
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in texts:
+                build_metrics(extract_parameters(text))
+        elapsed = time.perf_counter() - start
+    return len(texts) * repeat / elapsed
+
+
+def bench_stages(corpus, repeat):
+    """Mean microseconds per page for indexing and each extraction stage"""
+    totals = {"index": 0.0}
+    totals.update({name: 0.0 for name, _ in EXTRACTORS})
+    pages = 0
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            for _, text in corpus:
+                t0 = time.perf_counter()
+                index = index_page_text(text, text.lower())
+                totals["index"] += time.perf_counter() - t0
+                results = {k: 'N/A' for k in ('Temperature', 'Moisture', 'Electric Conductivity',
+                                              'Acidity', 'Nitrogen', 'Phosphorus', 'Potassium')}
+                for name, extractor in EXTRACTORS:
+                    t0 = time.perf_counter()
+                    extractor(text, index, results)
+                    totals[name] += time.perf_counter() - t0
+                pages += 1
+
+    return {k: v / pages * 1e6 for k, v in totals.items()}
+
+
+def count_allocations(fn):
+    """Memory allocations (frees not counted) made while running fn, or None without memray"""
+    if memray is None:
+        return None
+    frees = (memray.AllocatorType.FREE, memray.AllocatorType.PYMALLOC_FREE, memray.AllocatorType.MUNMAP)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "allocations.bin")
+        with memray.Tracker(path, trace_python_allocators=True):
+            fn()
+        return sum(1 for record in memray.FileReader(path).get_allocation_records()
+                   if record.allocator not in frees)
+
+
+def bench_memory(corpus):
+    """Per case: peak traced KiB and allocation count (None without memray) for one extraction"""
+    stats = {}
+    # The tracker's own bookkeeping, subtracted from every case
+    overhead = count_allocations(lambda: None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, text in corpus:
+            tracemalloc.start()
+            build_metrics(extract_parameters(text))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            allocations = count_allocations(lambda: build_metrics(extract_parameters(text)))
+            if allocations is not None:
+                allocations = max(allocations - overhead, 0)
+            stats[name] = (peak / 1024.0, allocations)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", "-r", type=int, default=20, help="Passes over the corpus (default: 20)")
+    parser.add_argument("--update", action="store_true", help=f"Re-record {EXPECTED_FILE} from current output")
+    parser.add_argument("--min-pps", type=float, default=None, help="Fail if throughput drops below this many pages/s")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    corpus = build_corpus()
+    print("="*60)
+    print(f"EXTRACTION BENCHMARK - {len(corpus)} cases")
+    print("="*60)
+
+    if args.update:
+        expected = {name: run_case(text) for name, text in corpus}
+        with open(EXPECTED_FILE, "w", encoding="utf-8") as f:
+            json.dump(expected, f, indent=2, ensure_ascii=False)
+        print(f"[OK] Recorded expected outputs for {len(expected)} cases in {EXPECTED_FILE}")
+        sys.exit(0)
+
+    try:
+        with open(EXPECTED_FILE, "r", encoding="utf-8") as f:
+            expected = json.load(f)
+    except (OSError, ValueError):
+        expected = {}
+
+    failures = check_expected(corpus, expected)
+    if failures:
+        print(f"[!] {len(failures)} regression(s):")
+        for failure in failures:
+            print(f"    - {failure}")
+    else:
+        print(f"[OK] All {len(corpus)} cases match {EXPECTED_FILE}")
+
+    pps = bench_throughput(corpus, args.repeat)
+    print(f"\nThroughput: {pps:,.0f} pages/s ({args.repeat} passes)")
+
+    print("\nPer-stage latency (mean µs/page):")
+    for stage, micros in bench_stages(corpus, args.repeat).items():
+        print(f"   {stage:25}: {micros:8.1f}")
+
+    print("\nMemory per page (peak KiB / allocations):")
+    if memray is None:
+        print("   (install memray for allocation counts)")
+    for name, (peak_kib, allocations) in bench_memory(corpus).items():
+        count = "n/a" if allocations is None else f"{allocations:,d}"
+        print(f"   {name:35}: {peak_kib:8.1f} KiB  {count:>9} allocations")
+
+    if failures:
+        sys.exit(1)
+    if args.min_pps is not None and pps < args.min_pps:
+        print(f"\n[!] Throughput {pps:,.0f} pages/s is below the {args.min_pps:,.0f} floor")
+        sys.exit(2)
@@ -0,0 +1,297 @@
+"""
+Long-lived headless Chromium pool for the dashboard scraper.
+
+Launching Chromium costs several seconds and a burst of memory, so instead of
+starting a browser per dashboard we keep one alive and hand out a fresh,
+isolated browser context for every page. The browser is recycled after a
+number of pages or when its resident memory (that browser's own process
+tree, not every Chromium in the process) grows past a limit.
+
+Playwright's sync API is bound to the thread that started it, so every
+thread gets its own pool through get_browser_pool(). Pools are also kept in a
+process-wide registry, so the browsers of worker threads can be shut down
+when the workers go away.
+"""
+
+from contextlib import contextmanager
+import os
+import signal
+import threading
+
+from playwright.sync_api import sync_playwright
+
+MAX_PAGES_PER_BROWSER = int(os.getenv("BROWSER_MAX_PAGES", "50"))
+MAX_BROWSER_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "700"))
+VIEWPORT = {"width": 1920, "height": 1080}
+
+_stats_lock = threading.Lock()
+_stats = {"launches": 0, "reuses": 0, "recycles": 0, "pages": 0}
+_local = threading.local()
+# Launches are serialized so each pool can tell which new processes are its own
+_launch_lock = threading.Lock()
+_pools_lock = threading.Lock()
+_pools = set()
+
+
+def _bump(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def get_pool_stats():
+    """Launch/reuse/recycle counters summed over every pool in the process"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+# -------- CHROMIUM MEMORY --------
+
+def _child_pids():
+    """Map of parent pid -> child pids, read from /proc (Linux only)"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces, the ppid follows its closing paren
+        ppid = int(stat[stat.rfind(")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _own_children():
+    if not os.path.isdir("/proc"):
+        return set()
+    try:
+        return set(_child_pids().get(os.getpid(), []))
+    except OSError:
+        return set()
+
+
+def _is_chromium(pid):
+    try:
+        with open(f"/proc/{pid}/comm", "r") as f:
+            comm = f.read().strip().lower()
+    except OSError:
+        return False
+    return "chrom" in comm or "headless" in comm
+
+
+def _descendants(children, roots):
+    stack = list(roots)
+    while stack:
+        pid = stack.pop()
+        yield pid
+        stack.extend(children.get(pid, []))
+
+
+def chromium_roots():
+    """Pids of the top Chromium process of every browser this process launched"""
+    if not os.path.isdir("/proc"):
+        return set()
+    try:
+        children = _child_pids()
+    except OSError:
+        return set()
+    roots = set()
+    stack = [(pid, False) for pid in children.get(os.getpid(), [])]
+    while stack:
+        pid, under_chromium = stack.pop()
+        chromium = _is_chromium(pid)
+        if chromium and not under_chromium:
+            roots.add(pid)
+        stack.extend((child, under_chromium or chromium) for child in children.get(pid, []))
+    return roots
+
+
+def browser_rss_mb(roots=None):
+    """
+    Resident memory of the Chromium process trees under roots (default:
+    every browser this process launched), or None off Linux
+    """
+    if roots is None:
+        roots = chromium_roots()
+    if not os.path.isdir("/proc"):
+        return None
+
+    try:
+        children = _child_pids()
+    except OSError:
+        return None
+
+    total_kb = 0
+    for pid in _descendants(children, roots):
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+
+    return total_kb / 1024.0
+
+
+# -------- POOL --------
+
+class BrowserPool:
+    """One reusable Chromium instance serving isolated contexts to a single thread"""
+
+    def __init__(self, max_pages=MAX_PAGES_PER_BROWSER, max_rss_mb=MAX_BROWSER_RSS_MB):
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._playwright = None
+        self._browser = None
+        # Root pid(s) of this pool's Chromium, for the per-browser RSS limit
+        self._browser_pids = set()
+        # Playwright driver process, so kill() can take everything down
+        self._driver_pids = set()
+        # Set by kill() from another thread; the owning thread starts over
+        self._killed = False
+        self._pages_served = 0
+
+    def _launch(self):
+        with _launch_lock:
+            if self._playwright is None:
+                before = _own_children()
+                self._playwright = sync_playwright().start()
+                self._driver_pids = _own_children() - before
+            before = chromium_roots()
+            self._browser = self._playwright.chromium.launch(headless=True)
+            self._browser_pids = chromium_roots() - before
+        # Back in the registry if a kill() took it out
+        with _pools_lock:
+            _pools.add(self)
+        self._pages_served = 0
+        _bump("launches")
+        print("   🚀 Launched pooled Chromium")
+
+    def _close_browser(self):
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+            self._browser_pids = set()
+
+    def _recycle_reason(self):
+        if self.max_pages and self._pages_served >= self.max_pages:
+            return f"{self._pages_served} pages served"
+        if self.max_rss_mb and self._browser_pids:
+            rss = browser_rss_mb(self._browser_pids)
+            if rss is not None and rss > self.max_rss_mb:
+                return f"RSS {rss:.0f} MB > {self.max_rss_mb} MB"
+        return None
+
+    def _ensure_browser(self):
+        if self._killed:
+            # Drop the dead driver's objects on the thread that owns them
+            self._killed = False
+            self.close()
+        if self._browser is None or not self._browser.is_connected():
+            self._close_browser()
+            self._launch()
+            return
+
+        reason = self._recycle_reason()
+        if reason:
+            print(f"   ♻️  Recycling Chromium ({reason})")
+            self._close_browser()
+            self._launch()
+            _bump("recycles")
+        else:
+            _bump("reuses")
+
+    @contextmanager
+    def page(self):
+        """Yield a page in a fresh browser context, closing the context afterwards"""
+        self._ensure_browser()
+        context = self._browser.new_context(viewport=VIEWPORT)
+        try:
+            yield context.new_page()
+        finally:
+            try:
+                context.close()
+            except Exception:
+                pass
+            self._pages_served += 1
+            _bump("pages")
+
+    def close(self):
+        self._close_browser()
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+        self._driver_pids = set()
+
+    def kill(self):
+        """
+        Kill this pool's driver and browser processes; safe from any thread.
+        A Playwright call blocked on them fails, and the owning thread
+        relaunches on its next page().
+        """
+        sig = getattr(signal, "SIGKILL", signal.SIGTERM)
+        try:
+            children = _child_pids()
+        except OSError:
+            children = {}
+        for pid in _descendants(children, self._driver_pids | self._browser_pids):
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                pass
+        self._browser_pids = set()
+        self._driver_pids = set()
+        self._killed = True
+
+
+def get_browser_pool():
+    """Return the calling thread's pool, creating it on first use"""
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = BrowserPool()
+        _local.pool = pool
+        with _pools_lock:
+            _pools.add(pool)
+    return pool
+
+
+def close_browser_pool():
+    """Shut down the calling thread's pool, if it has one"""
+    pool = getattr(_local, "pool", None)
+    if pool is not None:
+        pool.close()
+        _local.pool = None
+        with _pools_lock:
+            _pools.discard(pool)
+
+
+def close_all_browser_pools(include_own=True):
+    """
+    Close the calling thread's pool (unless include_own is False) and kill
+    the browsers of pools still open on other threads, which can't be
+    closed through Playwright from here
+    """
+    own = getattr(_local, "pool", None)
+    if include_own:
+        close_browser_pool()
+    with _pools_lock:
+        others = [pool for pool in _pools if pool is not own]
+        _pools.difference_update(others)
+    for pool in others:
+        pool.kill()
+
+
+def format_pool_stats():
+    s = get_pool_stats()
+    return (f"launches={s['launches']} reuses={s['reuses']} "
+            f"recycles={s['recycles']} pages={s['pages']}")
@@ -6,10 +6,9 @@ This helps identify what data is actually available vs. what's being extracted
 from playwright.sync_api import sync_playwright
 import time
 
-DASHBOARDS = {
-    "Sensor 1": "https://solisolcap.grafana.net/public-dashboards/5f813ad60cfd4d5495ee33fbac349c34",
-    "Sensor 2": "https://solisolcap.grafana.net/public-dashboards/36aa33cfd13c44d5a43422afa6fa1235",
-}
+from fleet import load_dashboards
+
+DASHBOARDS, _ = load_dashboards()
 
 def capture_dashboard(url, name="Dashboard"):
     """Capture raw page text and save to file"""
@@ -0,0 +1,197 @@
+"""
+Chart series downsampling for the history API.
+
+Two methods, both per sensor and per metric:
+
+- "lttb": Largest-Triangle-Three-Buckets, keeps the points that best preserve
+  the visual shape of the line. Results are cached per data version.
+- "minmax": fixed time buckets with min/avg/max. Bucket aggregates are folded
+  in incrementally as rows are appended, so a repeated dashboard load only
+  aggregates the rows that arrived since the last one.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import datetime
+import threading
+
+# Bucket widths (seconds) the minmax method picks from; a fixed ladder keeps
+# the cached aggregates reusable across requests
+BUCKET_WIDTHS = [60, 300, 600, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 7 * 86400]
+
+CACHE_SIZE = 128
+
+
+def iso_to_epoch(ts):
+    return datetime.fromisoformat(ts).timestamp()
+
+
+def epoch_to_iso(epoch):
+    return datetime.fromtimestamp(epoch).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+# -------- CACHE --------
+
+class LRUCache:
+    """
+    Small thread-safe LRU, e.g. downsampled series keyed on data version and
+    query. With weigh (value -> size), total size is kept under max_weight too.
+    """
+
+    def __init__(self, size=CACHE_SIZE, max_weight=None, weigh=None):
+        self.size = size
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self._entries = OrderedDict()
+        self._weight = 0
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.size or
+                                 (self.max_weight is not None and self._weight > self.max_weight)):
+            _, value = self._entries.popitem(last=False)
+            if self.weigh:
+                self._weight -= self.weigh(value)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                if self.weigh:
+                    self._weight += self.weigh(value)
+                self._evict()
+        return value
+
+
+# -------- LTTB --------
+
+def lttb(points, threshold):
+    """
+    Downsample [(x, y, ...), ...] (sorted by x) to at most `threshold` points.
+    Extra tuple items are carried along untouched.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = points[next_start:next_end]
+        avg_x = sum(p[0] for p in span) / len(span)
+        avg_y = sum(p[1] for p in span) / len(span)
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = points[a][0], points[a][1]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+# -------- BUCKETED MIN/AVG/MAX --------
+
+def pick_bucket_width(span_seconds, points):
+    for width in BUCKET_WIDTHS:
+        if span_seconds / width <= points:
+            return width
+    return BUCKET_WIDTHS[-1]
+
+
+class BucketAggregates:
+    """
+    Running [min, max, sum, count] per time bucket for each (sensor, field, width).
+
+    Folding walks only the rows appended since the previous call; a new cache
+    generation (file truncated or rotated) starts the aggregates over. Rows
+    whose timestamp doesn't parse are skipped.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._bounds = {'generation': None, 'seq': 0, 'first': None, 'last': None}
+        self._lock = threading.Lock()
+
+    def _fold(self, history, state, sensor, field, width):
+        generation, rows, epochs = history.rows_since(state['seq'], with_epochs=True)
+        if generation != state['generation']:
+            state.update(generation=generation, seq=0, buckets={}, keys=[])
+            generation, rows, epochs = history.rows_since(0, with_epochs=True)
+
+        buckets, keys = state['buckets'], state['keys']
+        for row, epoch in zip(rows, epochs):
+            if row.sensor != sensor or epoch is None:
+                continue
+            value = getattr(row, field)
+            if value is None:
+                continue
+            start = epoch - epoch % width
+            agg = buckets.get(start)
+            if agg is None:
+                buckets[start] = [value, value, value, 1]
+                if not keys or start > keys[-1]:
+                    keys.append(start)
+                else:
+                    insort(keys, start)
+            else:
+                if value < agg[0]:
+                    agg[0] = value
+                if value > agg[1]:
+                    agg[1] = value
+                agg[2] += value
+                agg[3] += 1
+        state['seq'] += len(rows)
+
+    def epoch_bounds(self, history):
+        """(first, last) epoch over every row whose timestamp parses, or (None, None)"""
+        with self._lock:
+            state = self._bounds
+            generation, rows, epochs = history.rows_since(state['seq'], with_epochs=True)
+            if generation != state['generation']:
+                state.update(generation=generation, seq=0, first=None, last=None)
+                generation, rows, epochs = history.rows_since(0, with_epochs=True)
+            parsed = [e for e in epochs if e is not None]
+            if parsed:
+                lo, hi = min(parsed), max(parsed)
+                state['first'] = lo if state['first'] is None else min(state['first'], lo)
+                state['last'] = hi if state['last'] is None else max(state['last'], hi)
+            state['seq'] += len(rows)
+            return state['first'], state['last']
+
+    def series(self, history, sensor, field, width, since_epoch=None, until_epoch=None):
+        """Return {"t", "min", "avg", "max"} lists for buckets overlapping the range"""
+        with self._lock:
+            state = self._series.setdefault(
+                (sensor, field, width),
+                {'generation': None, 'seq': 0, 'buckets': {}, 'keys': []})
+            self._fold(history, state, sensor, field, width)
+
+            keys = state['keys']
+            lo = bisect_left(keys, since_epoch - since_epoch % width) if since_epoch is not None else 0
+            hi = bisect_right(keys, until_epoch) if until_epoch is not None else len(keys)
+
+            out = {'t': [], 'min': [], 'avg': [], 'max': []}
+            for start in keys[lo:hi]:
+                mn, mx, total, count = state['buckets'][start]
+                out['t'].append(epoch_to_iso(start))
+                out['min'].append(mn)
+                out['avg'].append(round(total / count, 3))
+                out['max'].append(mx)
+            return out
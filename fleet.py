@@ -0,0 +1,183 @@
+"""
+Dashboard fleet: which dashboards exist, and which of them this process scrapes.
+
+Dashboards are read from DASHBOARDS_CONFIG, a JSON file or a directory of
+JSON files merged in name order. Each maps a dashboard name to its public URL,
+optionally with a per-dashboard interval:
+
+    {
+      "Sensor 1": "https://.../public-dashboards/...",
+      "Sensor 3": {"url": "https://.../public-dashboards/...", "interval_minutes": 5}
+    }
+
+With FLEET_SHARDING=1 several scraper processes split the fleet. Each member
+keeps a heartbeat file in FLEET_DIR (shared between hosts if they share a
+volume), and every dashboard belongs to the live member with the highest
+rendezvous hash of (member, dashboard), so a member joining or leaving only
+moves the dashboards it gains or loses. Hosts without a shared directory can
+pin a static split with SHARD_COUNT and SHARD_INDEX instead.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from lease import LEASE_TTL_SECONDS, LEASE_HEARTBEAT_SECONDS
+
+DASHBOARDS_CONFIG = os.getenv("DASHBOARDS_CONFIG", "dashboards.json")
+FLEET_SHARDING = os.getenv("FLEET_SHARDING", "0") == "1"
+FLEET_DIR = os.getenv("FLEET_DIR", "fleet")
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0"))
+
+
+# -------- CONFIG --------
+
+def _config_files(path):
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*.json")))
+    return [path] if os.path.exists(path) else []
+
+
+def load_dashboards(path=DASHBOARDS_CONFIG):
+    """({name: url}, {name: interval minutes}) from the config file or directory"""
+    dashboards, intervals = {}, {}
+    files = _config_files(path)
+    if not files:
+        print(f"⚠️  No dashboard config found at {path}")
+    for filename in files:
+        with open(filename, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        for name, entry in config.items():
+            if name in dashboards:
+                print(f"⚠️  Dashboard '{name}' in {filename} overrides an earlier definition")
+            if isinstance(entry, str):
+                entry = {"url": entry}
+            if not entry.get("url"):
+                raise ValueError(f"Dashboard '{name}' in {filename} has no url")
+            dashboards[name] = entry["url"]
+            if entry.get("interval_minutes"):
+                intervals[name] = float(entry["interval_minutes"])
+            else:
+                intervals.pop(name, None)
+    return dashboards, intervals
+
+
+# -------- SHARDING --------
+
+def _weight(member, name):
+    return int.from_bytes(hashlib.sha1(f"{member}\0{name}".encode("utf-8")).digest()[:8], "big")
+
+
+def rendezvous_owner(name, members):
+    """Member a dashboard belongs to: the one with the highest hash of (member, name)"""
+    return max(members, key=lambda member: _weight(member, name)) if members else None
+
+
+class StaticShard:
+    """Fixed split into SHARD_COUNT shards; this process is shard SHARD_INDEX"""
+
+    def __init__(self, index=SHARD_INDEX, count=SHARD_COUNT):
+        if not 0 <= index < count:
+            raise ValueError(f"SHARD_INDEX must be in 0..{count - 1}, got {index}")
+        self.id = f"shard-{index}"
+        self._members = [f"shard-{i}" for i in range(count)]
+
+    def join(self):
+        pass
+
+    def leave(self):
+        pass
+
+    def members(self):
+        return list(self._members)
+
+    def assigned(self, names):
+        return [n for n in names if rendezvous_owner(n, self._members) == self.id]
+
+
+def live_members(directory=FLEET_DIR, ttl=LEASE_TTL_SECONDS, clock=time.time):
+    """Ids of the dynamic members whose heartbeat in directory is within the TTL"""
+    now = clock()
+    live = set()
+    for filename in glob.glob(os.path.join(directory, "*.json")):
+        try:
+            with open(filename, "r") as f:
+                member = json.load(f)
+        except (OSError, ValueError):
+            continue
+        age = now - member.get('heartbeat_at', 0)
+        if age <= ttl:
+            live.add(member['member'])
+        elif age > 10 * ttl:
+            # Long gone (crashed without leaving); tidy up
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+    return live
+
+
+class FleetMember:
+    """Dynamic membership: a heartbeat file per live scraper in FLEET_DIR"""
+
+    def __init__(self, directory=FLEET_DIR, ttl=LEASE_TTL_SECONDS, heartbeat=LEASE_HEARTBEAT_SECONDS,
+                 clock=time.time):
+        self.directory = directory
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.clock = clock
+        self.id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.path = os.path.join(directory, self.id + ".json")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _beat(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({'member': self.id, 'pid': os.getpid(), 'heartbeat_at': self.clock()}, f)
+        os.replace(tmp, self.path)
+
+    def _run_heartbeat(self):
+        while not self._stop.wait(self.heartbeat):
+            try:
+                self._beat()
+            except OSError as e:
+                print(f"⚠️  Fleet heartbeat failed: {e}")
+
+    def join(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._beat()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_heartbeat, daemon=True)
+        self._thread.start()
+
+    def leave(self):
+        """Stop heartbeating and deregister, so the others take over at once"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def members(self):
+        """Ids of members whose heartbeat is within the TTL, this one included"""
+        return sorted(live_members(self.directory, self.ttl, self.clock) | {self.id})
+
+    def assigned(self, names):
+        members = self.members()
+        return [n for n in names if rendezvous_owner(n, members) == self.id]
+
+
+def open_shard():
+    """StaticShard when SHARD_COUNT is set, else dynamic FleetMember"""
+    if SHARD_COUNT:
+        return StaticShard()
+    return FleetMember()
@@ -0,0 +1,261 @@
+"""
+Browserless fetch backend for Grafana public dashboards.
+
+Instead of rendering the dashboard in Chromium and scraping its text, this
+asks Grafana's public dashboard API for the dashboard model, runs each
+panel's query over a pooled requests.Session and maps the returned data
+frames to the same results dict that monitor.extract_parameters produces,
+so build_metrics, display_terminal and save_reading work unchanged.
+
+    GET  {base}/api/public/dashboards/{token}
+    POST {base}/api/public/dashboards/{token}/panels/{panel_id}/query
+
+Set GRAFANA_RECORD_DIR to save every response; grafana_stub.py serves such
+a directory back for offline testing.
+"""
+
+import json
+import os
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PUBLIC_URL_RE = re.compile(r'^(?P<base>https?://.+?)/public-dashboards/(?P<token>[0-9a-zA-Z]+)')
+
+# API calls the Grafana frontend makes while rendering a public dashboard
+DASHBOARD_API_RE = re.compile(r'/api/public/dashboards/(?P<token>[0-9a-zA-Z]+)(?:\?|$)')
+PANEL_QUERY_API_RE = re.compile(r'/api/public/dashboards/(?P<token>[0-9a-zA-Z]+)/panels/(?P<panel>\d+)/query')
+
+REQUEST_TIMEOUT_SECONDS = 15
+MAX_DATA_POINTS = 100
+RECORD_DIR = os.getenv("GRAFANA_RECORD_DIR")
+
+# Results key -> pattern matched against field names, labels and panel titles.
+# NPK comes first so that "phosphorus" is never taken for pH.
+METRIC_PATTERNS = [
+    ('Nitrogen', re.compile(r'nitrogen', re.IGNORECASE)),
+    ('Phosphorus', re.compile(r'phosphorus', re.IGNORECASE)),
+    ('Potassium', re.compile(r'potassium', re.IGNORECASE)),
+    ('Temperature', re.compile(r'temp', re.IGNORECASE)),
+    ('Moisture', re.compile(r'moist|humid', re.IGNORECASE)),
+    ('Electric Conductivity', re.compile(r'conductivity|(?:^|[^a-z])ec(?:[^a-z]|$)', re.IGNORECASE)),
+    ('Acidity', re.compile(r'acidity|(?:^|[^a-z])ph(?:[^a-z]|$)', re.IGNORECASE)),
+]
+
+UNIT_FORMATS = {
+    'Temperature': "{} °C",
+    'Moisture': "{} %",
+    'Electric Conductivity': "{:.0f} µS/cm",
+    'Acidity': "{:.2f} pH",
+    'Nitrogen': "{} mg/kg",
+    'Phosphorus': "{} mg/kg",
+    'Potassium': "{} mg/kg",
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class GrafanaAPIError(Exception):
+    pass
+
+
+def get_session():
+    """Process-wide session so connections to Grafana are kept alive and reused"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _session.headers.update({"Accept": "application/json"})
+        return _session
+
+
+def parse_public_url(url):
+    """Split a public dashboard URL into (base_url, access_token)"""
+    m = PUBLIC_URL_RE.match(url)
+    if not m:
+        raise GrafanaAPIError(f"Not a Grafana public dashboard URL: {url}")
+    return m.group('base'), m.group('token')
+
+
+def _record(token, suffix, payload):
+    if not RECORD_DIR:
+        return
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    with open(os.path.join(RECORD_DIR, f"{token}{suffix}.json"), "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+
+
+def _request(session, method, url, **kwargs):
+    try:
+        resp = session.request(method, url, timeout=REQUEST_TIMEOUT_SECONDS, **kwargs)
+        resp.raise_for_status()
+        return resp.json()
+    except (requests.RequestException, ValueError) as e:
+        raise GrafanaAPIError(f"{method} {url} failed: {e}")
+
+
+# -------- DASHBOARD MODEL --------
+
+def fetch_dashboard(base, token, session=None):
+    session = session or get_session()
+    payload = _request(session, "GET", f"{base}/api/public/dashboards/{token}")
+    _record(token, "", payload)
+    return payload
+
+
+def iter_panels(panels):
+    """Yield every panel, descending into collapsed rows"""
+    for panel in panels or []:
+        if panel.get("type") == "row":
+            yield from iter_panels(panel.get("panels"))
+        else:
+            yield panel
+
+
+def query_panel(base, token, panel_id, time_range, session=None):
+    session = session or get_session()
+    body = {
+        "intervalMs": 60000,
+        "maxDataPoints": MAX_DATA_POINTS,
+        "timeRange": {
+            "from": time_range.get("from", "now-24h"),
+            "to": time_range.get("to", "now"),
+            "timezone": "browser",
+        },
+    }
+    payload = _request(session, "POST",
+                       f"{base}/api/public/dashboards/{token}/panels/{panel_id}/query",
+                       json=body)
+    _record(token, f"_{panel_id}", payload)
+    return payload
+
+
+# -------- FRAME MAPPING --------
+
+def _last_value(values):
+    for v in reversed(values or []):
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            return float(v)
+    return None
+
+
+def iter_frame_values(query_payload):
+    """Yield (label, last_value) for every numeric field in a panel query response"""
+    for result in (query_payload.get("results") or {}).values():
+        for frame in result.get("frames") or []:
+            schema = frame.get("schema") or {}
+            columns = (frame.get("data") or {}).get("values") or []
+            for i, field in enumerate(schema.get("fields") or []):
+                if field.get("type") not in (None, "number"):
+                    continue
+                config = field.get("config") or {}
+                label = " ".join(str(x) for x in [
+                    config.get("displayName"),
+                    config.get("displayNameFromDS"),
+                    field.get("name"),
+                    " ".join(str(v) for v in (field.get("labels") or {}).values()),
+                    schema.get("name"),
+                ] if x)
+                values = columns[i] if i < len(columns) else []
+                yield label, _last_value(values)
+
+
+def classify(*texts):
+    """Return the results key whose pattern matches the first text that matches any"""
+    for text in texts:
+        if not text:
+            continue
+        for key, pattern in METRIC_PATTERNS:
+            if pattern.search(text):
+                return key
+    return None
+
+
+def frames_to_results(panel_values):
+    """
+    Build an extract_parameters-style results dict.
+
+    panel_values is an iterable of (panel_title, field_label, value) tuples.
+    """
+    results = {
+        'Growing Parameters': 'N/A',
+        'Temperature': 'N/A',
+        'Moisture': 'N/A',
+        'Electric Conductivity': 'N/A',
+        'Acidity': 'N/A',
+        'Nitrogen': 'N/A',
+        'Phosphorus': 'N/A',
+        'Potassium': 'N/A',
+        '_data_quality': 'GOOD'
+    }
+
+    empty = 0
+    for title, label, value in panel_values:
+        if title and re.search(r'GROWING\s*PARAMETERS', title, re.IGNORECASE):
+            results['Growing Parameters'] = '✓ Section Found'
+        key = classify(label, title)
+        if key is None:
+            continue
+        if value is None:
+            empty += 1
+            continue
+        if results[key] == 'N/A':
+            results[key] = UNIT_FORMATS[key].format(value)
+
+    if empty > 3:
+        results['_data_quality'] = 'POOR_NO_DATA'
+        print(f"   ⚠️  Data quality warning: {empty} panel(s) returned no data")
+
+    return results
+
+
+def query_panels(dashboard):
+    """Panels that issue queries, i.e. the ones whose responses carry metric data"""
+    return [p for p in iter_panels(dashboard.get("panels")) if p.get("targets")]
+
+
+def results_from_payloads(dashboard, payloads):
+    """
+    Map panel query responses to a results dict.
+
+    payloads maps panel id -> query response JSON; panels with no response
+    (or a failed query) count as empty.
+    """
+    panel_values = []
+    for panel in query_panels(dashboard):
+        title = panel.get("title", "")
+        payload = payloads.get(panel.get("id"))
+        fields = list(iter_frame_values(payload)) if payload else []
+        if not fields:
+            panel_values.append((title, "", None))
+        for label, value in fields:
+            panel_values.append((title, label, value))
+    return frames_to_results(panel_values)
+
+
+# -------- ENTRY POINT --------
+
+def fetch_results(url, name="Dashboard", session=None):
+    """Fetch one public dashboard's panel data and return a results dict"""
+    session = session or get_session()
+    base, token = parse_public_url(url)
+
+    print(f"\n📡 Querying {name} via Grafana API...")
+    model = fetch_dashboard(base, token, session)
+    dashboard = model.get("dashboard") or {}
+    time_range = dashboard.get("time") or {}
+
+    payloads = {}
+    for panel in query_panels(dashboard):
+        try:
+            payloads[panel["id"]] = query_panel(base, token, panel["id"], time_range, session)
+        except GrafanaAPIError as e:
+            print(f"   ⚠️  Panel '{panel.get('title', '')}' query failed: {e}")
+
+    return results_from_payloads(dashboard, payloads)
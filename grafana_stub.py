@@ -0,0 +1,74 @@
+"""
+Local stand-in for Grafana's public dashboard API, serving recorded responses.
+
+Record real responses with GRAFANA_RECORD_DIR=recorded python monitor.py --fetch-mode api,
+then serve them back:
+
+    python grafana_stub.py recorded --port 3999
+
+and point a dashboard at http://127.0.0.1:3999/public-dashboards/<token>.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import os
+import re
+import threading
+
+DASHBOARD_PATH = re.compile(r'^/api/public/dashboards/(?P<token>[0-9a-zA-Z]+)$')
+QUERY_PATH = re.compile(r'^/api/public/dashboards/(?P<token>[0-9a-zA-Z]+)/panels/(?P<panel>\d+)/query$')
+
+
+def make_handler(record_dir):
+    class StubHandler(BaseHTTPRequestHandler):
+        def _serve(self, filename):
+            path = os.path.join(record_dir, filename)
+            if not os.path.isfile(path):
+                self.send_error(404, f"No recorded response {filename}")
+                return
+            with open(path, "rb") as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            m = DASHBOARD_PATH.match(self.path)
+            if not m:
+                self.send_error(404)
+                return
+            self._serve(f"{m.group('token')}.json")
+
+        def do_POST(self):
+            # Drain the query body so keep-alive connections stay in sync
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            m = QUERY_PATH.match(self.path)
+            if not m:
+                self.send_error(404)
+                return
+            self._serve(f"{m.group('token')}_{m.group('panel')}.json")
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub(record_dir, port=0):
+    """Start the stub on a background thread; returns the server (see server_address)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(record_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("record_dir", help="Directory of recorded Grafana responses")
+    parser.add_argument("--port", "-p", type=int, default=3999)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.record_dir))
+    print(f"[OK] Grafana stub serving {args.record_dir} on http://127.0.0.1:{args.port}")
+    server.serve_forever()
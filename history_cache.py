@@ -0,0 +1,256 @@
+"""
+Process-wide, incrementally refreshed cache of readings_history.csv.
+
+The file is parsed once; after that every refresh() only stats the file and
+reads the bytes appended since the last call. Rows are kept as typed
+namedtuples (floats / None for readings, interned strings for the rest).
+Truncation, rotation (a new inode) or a rewritten header trigger a full
+reload and bump `generation`, so anything keyed on (generation, row count)
+notices the change.
+
+Rows are also indexed by timestamp, overall and per sensor, so range
+queries bisect to their bounds and only touch the rows they return.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime
+import csv
+import os
+import sys
+import threading
+
+COLUMNS = [
+    'timestamp_iso', 'sensor', 'temperature_c', 'moisture_pct',
+    'ec_us_cm', 'ph', 'nitrogen', 'phosphorus', 'potassium',
+    'temperature_status', 'moisture_status',
+    'ec_status', 'ph_status', 'overall_status'
+]
+NUMERIC_COLUMNS = {
+    'temperature_c', 'moisture_pct', 'ec_us_cm', 'ph',
+    'nitrogen', 'phosphorus', 'potassium',
+}
+
+Reading = namedtuple('Reading', COLUMNS)
+
+
+def _to_float(value):
+    if value is None:
+        return None
+    value = value.strip()
+    if not value or value in ('NA', 'N/A', 'None'):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _to_epoch(ts):
+    try:
+        return datetime.fromisoformat(ts).timestamp()
+    except ValueError:
+        return None
+
+
+def _format_number(value):
+    """Shortest string for a parsed reading: 508.0 -> '508', 20.70 -> '20.7', None -> 'NA'"""
+    if value is None:
+        return 'NA'
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def reading_to_dict(row):
+    """
+    Row as API strings, numbers in their canonical form rather than as
+    spelled in the CSV ('508.0' comes back as '508', '20.70' as '20.7');
+    the SQLite and columnar backends only keep the value. 'NA' for missing.
+    """
+    d = row._asdict()
+    for col in NUMERIC_COLUMNS:
+        d[col] = _format_number(d[col])
+    return d
+
+
+class HistoryCache:
+    def __init__(self, path):
+        self.path = path
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._rows = []
+        # Seconds since the epoch per row (None if the timestamp doesn't parse)
+        self._epochs = []
+        # Timestamp-sorted (keys, row positions), overall and per sensor
+        self._ts_index = ([], [])
+        self._sensor_index = {}
+        self._header = None
+        self._header_bytes = b""
+        self._offset = 0
+        self._size = -1
+        self._mtime = None
+        self._inode = None
+
+    # -------- PARSING --------
+
+    def _parse_row(self, values):
+        record = dict(zip(self._header, values))
+        fields = []
+        for col in COLUMNS:
+            value = record.get(col)
+            if col in NUMERIC_COLUMNS:
+                fields.append(_to_float(value))
+            else:
+                fields.append(sys.intern(value) if value else 'NA')
+        return Reading(*fields)
+
+    def _consume(self, chunk):
+        """Parse complete lines from chunk, return how many bytes were used"""
+        end = chunk.rfind(b"\n") + 1
+        if end == 0:
+            return 0
+
+        lines = chunk[:end].decode("utf-8", errors="replace").splitlines()
+        for values in csv.reader(lines):
+            if not values:
+                continue
+            if self._header is None:
+                self._header = [v.strip() for v in values]
+                continue
+            row = self._parse_row(values)
+            self._index_row(len(self._rows), row)
+            self._rows.append(row)
+            self._epochs.append(_to_epoch(row.timestamp_iso))
+        return end
+
+    def _index_row(self, pos, row):
+        ts = row.timestamp_iso
+        for keys, positions in (self._ts_index,
+                                self._sensor_index.setdefault(row.sensor, ([], []))):
+            if not keys or ts >= keys[-1]:
+                keys.append(ts)
+                positions.append(pos)
+            else:
+                # Out-of-order row (clock change, merged files): keep the index sorted
+                i = bisect_right(keys, ts)
+                keys.insert(i, ts)
+                positions.insert(i, pos)
+
+    def _header_changed(self, f):
+        if not self._header_bytes:
+            return False
+        f.seek(0)
+        return f.read(len(self._header_bytes)) != self._header_bytes
+
+    # -------- REFRESH --------
+
+    def refresh(self):
+        """Bring the cache up to date with the file; cheap when nothing changed"""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                if self._size != -1 or self._rows:
+                    self._reset()
+                    self.generation += 1
+                return
+
+            unchanged = (st.st_size == self._size and st.st_mtime == self._mtime
+                         and st.st_ino == self._inode)
+            if unchanged:
+                return
+
+            with open(self.path, "rb") as f:
+                rotated = self._inode is not None and st.st_ino != self._inode
+                if rotated or st.st_size < self._offset or self._header_changed(f):
+                    self._reset()
+                    self.generation += 1
+
+                f.seek(self._offset)
+                chunk = f.read(st.st_size - self._offset)
+                used = self._consume(chunk)
+                if self._header is not None and not self._header_bytes:
+                    f.seek(0)
+                    self._header_bytes = f.readline()
+                self._offset += used
+
+            self._size = st.st_size
+            self._mtime = st.st_mtime
+            self._inode = st.st_ino
+
+    def rows(self):
+        """Refresh and return the list of Reading rows (treat as read-only)"""
+        self.refresh()
+        return self._rows
+
+    def _index_for(self, sensor):
+        if sensor is None:
+            return self._ts_index
+        return self._sensor_index.get(sensor, ([], []))
+
+    def _bounds(self, keys, since, until):
+        lo = bisect_left(keys, since) if since else 0
+        hi = bisect_right(keys, until) if until else len(keys)
+        return lo, hi
+
+    def span(self, since=None, until=None, sensor=None):
+        """
+        (lo, hi) index bounds a query would select: a cheap key for caching
+        anything derived from its rows alongside version()
+        """
+        self.refresh()
+        with self._lock:
+            return self._bounds(self._index_for(sensor)[0], since, until)
+
+    def count(self, since=None, until=None, sensor=None):
+        """Number of rows query() would return"""
+        lo, hi = self.span(since, until, sensor)
+        return hi - lo
+
+    def query(self, since=None, until=None, sensor=None, with_epochs=False):
+        """
+        Rows with since <= timestamp_iso <= until (ISO strings, either may be
+        None), optionally for one sensor, in timestamp order. With
+        with_epochs, returns (rows, epochs) instead.
+        """
+        self.refresh()
+        with self._lock:
+            keys, positions = self._index_for(sensor)
+            lo, hi = self._bounds(keys, since, until)
+            rows = self._rows
+            selected = positions[lo:hi]
+            if with_epochs:
+                epochs = self._epochs
+                return [rows[p] for p in selected], [epochs[p] for p in selected]
+            return [rows[p] for p in selected]
+
+    def sensors(self):
+        self.refresh()
+        with self._lock:
+            return sorted(self._sensor_index)
+
+    def bounds(self, sensor=None):
+        """(first, last) timestamp_iso overall or for one sensor; (None, None) if empty"""
+        self.refresh()
+        with self._lock:
+            keys = self._index_for(sensor)[0]
+            return (keys[0], keys[-1]) if keys else (None, None)
+
+    def rows_since(self, seq, with_epochs=False):
+        """
+        (generation, rows appended from position seq on) in file order, plus
+        their epochs when with_epochs is set. Callers folding rows
+        incrementally should start over when the generation changes.
+        """
+        self.refresh()
+        with self._lock:
+            if with_epochs:
+                return self.generation, self._rows[seq:], self._epochs[seq:]
+            return self.generation, self._rows[seq:]
+
+    def version(self):
+        """(generation, row count): changes whenever the visible data changes"""
+        self.refresh()
+        return self.generation, len(self._rows)
@@ -0,0 +1,181 @@
+"""
+Leader lease so exactly one scraper runs per deployment.
+
+`python server.py`, gunicorn workers and `monitor.py --watch` can all end up
+running against the same data directory. Every would-be scraper contends for
+the lease in LEASE_FILE and only the holder scrapes:
+
+- the lease is only read and rewritten under an exclusive lock on
+  LEASE_FILE + ".lock", so two processes can't claim it at once
+- the holder renews it every LEASE_HEARTBEAT_SECONDS from a background thread
+- a lease whose heartbeat is older than LEASE_TTL_SECONDS (holder crashed or
+  hung) is taken over by the next contender
+- every takeover bumps the token, so a holder that stalled past its TTL finds
+  out on its next renewal and stands down
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LEASE_FILE = os.getenv("LEASE_FILE", "scraper.lease")
+LEASE_TTL_SECONDS = float(os.getenv("LEASE_TTL_SECONDS", "90"))
+LEASE_HEARTBEAT_SECONDS = float(os.getenv("LEASE_HEARTBEAT_SECONDS", str(LEASE_TTL_SECONDS / 3)))
+
+
+class FileLock:
+    """Exclusive lock on a small sidecar file, held for the duration of a with block"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._f = open(self.path, "a+")
+        if fcntl:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_EX)
+        else:
+            self._f.seek(0)
+            msvcrt.locking(self._f.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl:
+                fcntl.flock(self._f.fileno(), fcntl.LOCK_UN)
+            else:
+                self._f.seek(0)
+                msvcrt.locking(self._f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._f.close()
+
+
+def file_signature(path):
+    """(inode, mtime, size) of path, None if missing: changes whenever the file is replaced"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def read_lease(path=LEASE_FILE):
+    """Current lease contents, or None if nobody has claimed it"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_lease(path, lease):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(lease, f, indent=2)
+    os.replace(tmp, path)
+
+
+class ScraperLease:
+    def __init__(self, path=LEASE_FILE, ttl=LEASE_TTL_SECONDS, heartbeat=LEASE_HEARTBEAT_SECONDS,
+                 clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self.clock = clock
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.token = None
+        self._held = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _claim(self):
+        with FileLock(self.path + ".lock"):
+            current = read_lease(self.path)
+            now = self.clock()
+            if current and current.get('owner') != self.owner and \
+                    now - current.get('heartbeat_at', 0) <= self.ttl:
+                return False
+            token = (current or {}).get('token', 0) + 1
+            _write_lease(self.path, {
+                'owner': self.owner,
+                'pid': os.getpid(),
+                'host': socket.gethostname(),
+                'token': token,
+                'acquired_at': now,
+                'heartbeat_at': now,
+            })
+            self.token = token
+            return True
+
+    def _renew(self):
+        with FileLock(self.path + ".lock"):
+            current = read_lease(self.path)
+            if not current or current.get('owner') != self.owner or current.get('token') != self.token:
+                return False
+            current['heartbeat_at'] = self.clock()
+            _write_lease(self.path, current)
+            return True
+
+    def _run_heartbeat(self):
+        last_renewed = self.clock()
+        while not self._stop.wait(self.heartbeat):
+            try:
+                if self._renew():
+                    last_renewed = self.clock()
+                    continue
+                print(f"⚠️  Scraper lease taken over by {(read_lease(self.path) or {}).get('owner')}")
+            except OSError as e:
+                # Keep trying until the lease would have expired anyway
+                print(f"⚠️  Scraper lease renewal failed: {e}")
+                if self.clock() - last_renewed <= self.ttl:
+                    continue
+            self._held.clear()
+            return
+
+    def try_acquire(self):
+        """Claim the lease if it is free or expired; True when this process is now the scraper"""
+        if self._held.is_set():
+            return True
+        if not self._claim():
+            return False
+        self._held.set()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_heartbeat, daemon=True)
+        self._thread.start()
+        return True
+
+    def acquire(self, poll=None):
+        """Block, standing by, until this process holds the lease"""
+        announced = False
+        while not self.try_acquire():
+            if not announced:
+                holder = read_lease(self.path) or {}
+                print(f"⏳ Standing by: scraper lease held by {holder.get('owner')}")
+                announced = True
+            time.sleep(poll or self.heartbeat)
+        print(f"🔑 Scraper lease acquired (token {self.token}, ttl {self.ttl:g}s)")
+
+    def held(self):
+        return self._held.is_set()
+
+    def release(self):
+        """Stop the heartbeat and hand the lease back so a standby takes over at once"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if not self._held.is_set():
+            return
+        self._held.clear()
+        with FileLock(self.path + ".lock"):
+            current = read_lease(self.path)
+            if current and current.get('owner') == self.owner and current.get('token') == self.token:
+                current['heartbeat_at'] = 0
+                _write_lease(self.path, current)
@@ -0,0 +1,210 @@
+"""
+Online per-sensor, per-metric statistics and anomaly flags.
+
+Every reading updates, in O(1) (amortized for the windows):
+
+- Welford running mean / variance over all readings
+- an EWMA mean / variance (STATS_EWMA_ALPHA), which follows recent behaviour
+- min / max over rolling windows (STATS_WINDOWS), kept in monotonic deques;
+  windows end at the sensor's newest reading
+
+Before a value is folded in it is scored against the stats so far: a z-score
+against the Welford mean and a deviation in EWMA standard deviations. Either
+reaching ANOMALY_Z (once ANOMALY_MIN_SAMPLES readings are in) flags it.
+
+MetricStats folds storage incrementally through rows_since(), like
+downsample.BucketAggregates, so the scraper and the server each keep their
+own copy current without sharing state or rereading history. Rows whose
+timestamp doesn't parse are skipped: the windows need a time.
+"""
+
+from collections import deque
+import math
+import os
+import threading
+
+from history_cache import NUMERIC_COLUMNS
+
+STATS_EWMA_ALPHA = float(os.getenv("STATS_EWMA_ALPHA", "0.1"))
+ANOMALY_Z = float(os.getenv("ANOMALY_Z", "3.0"))
+ANOMALY_MIN_SAMPLES = int(os.getenv("ANOMALY_MIN_SAMPLES", "30"))
+# Rolling min/max windows as label=seconds
+STATS_WINDOWS = os.getenv("STATS_WINDOWS", "1h=3600,24h=86400,7d=604800")
+RECENT_ANOMALIES = 100
+
+
+def parse_windows(spec):
+    windows = []
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        label, _, seconds = item.partition("=")
+        windows.append((label.strip(), float(seconds)))
+    return windows
+
+
+class RollingExtreme:
+    """Min (or max) over a trailing time window via a monotonic deque"""
+
+    def __init__(self, seconds, largest=False):
+        self.seconds = seconds
+        self.largest = largest
+        self._entries = deque()
+
+    def add(self, epoch, value):
+        entries = self._entries
+        if self.largest:
+            while entries and entries[-1][1] <= value:
+                entries.pop()
+        else:
+            while entries and entries[-1][1] >= value:
+                entries.pop()
+        entries.append((epoch, value))
+        while entries[0][0] <= epoch - self.seconds:
+            entries.popleft()
+
+    def value(self):
+        return self._entries[0][1] if self._entries else None
+
+
+class RunningStats:
+    def __init__(self, windows, alpha=STATS_EWMA_ALPHA):
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.ewma = None
+        self.ewma_var = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+        self.last_epoch = None
+        self.last_z = None
+        self.last_ewma_z = None
+        self.windows = {label: (RollingExtreme(seconds), RollingExtreme(seconds, largest=True))
+                        for label, seconds in windows}
+
+    def std(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else None
+
+    def score(self, value):
+        """(z-score, EWMA deviation) of value against the stats so far"""
+        std = self.std()
+        z = (value - self.mean) / std if std else None
+        ewma_std = math.sqrt(self.ewma_var) if self.ewma_var > 0 else None
+        ewma_z = (value - self.ewma) / ewma_std if ewma_std else None
+        return z, ewma_z
+
+    def is_anomaly(self, z, ewma_z):
+        if self.count < ANOMALY_MIN_SAMPLES:
+            return False
+        return any(s is not None and abs(s) >= ANOMALY_Z for s in (z, ewma_z))
+
+    def add(self, epoch, value):
+        """Fold in one reading; returns (z, ewma_z, anomaly) scored before it was added"""
+        z, ewma_z = self.score(value)
+        anomaly = self.is_anomaly(z, ewma_z)
+
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        if self.ewma is None:
+            self.ewma = value
+        else:
+            diff = value - self.ewma
+            incr = self.alpha * diff
+            self.ewma += incr
+            self.ewma_var = (1 - self.alpha) * (self.ewma_var + diff * incr)
+
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for low, high in self.windows.values():
+            low.add(epoch, value)
+            high.add(epoch, value)
+
+        self.last, self.last_epoch, self.last_z, self.last_ewma_z = value, epoch, z, ewma_z
+        return z, ewma_z, anomaly
+
+    def to_dict(self):
+        std = self.std()
+        ewma_std = math.sqrt(self.ewma_var) if self.ewma is not None else None
+        return {
+            'count': self.count,
+            'mean': _round(self.mean if self.count else None),
+            'std': _round(std),
+            'min': self.min,
+            'max': self.max,
+            'ewma': _round(self.ewma),
+            'ewma_std': _round(ewma_std),
+            'last': self.last,
+            'z': _round(self.last_z),
+            'ewma_z': _round(self.last_ewma_z),
+            'anomaly': self.is_anomaly(self.last_z, self.last_ewma_z),
+            'windows': {label: {'min': low.value(), 'max': high.value()}
+                        for label, (low, high) in self.windows.items()},
+        }
+
+
+def _round(value):
+    return round(value, 4) if value is not None else None
+
+
+class MetricStats:
+    """RunningStats per (sensor, metric), folded from storage as rows are appended"""
+
+    def __init__(self, windows=None, fields=None):
+        self.windows = parse_windows(STATS_WINDOWS) if windows is None else windows
+        self.fields = sorted(NUMERIC_COLUMNS) if fields is None else fields
+        self.anomalies = deque(maxlen=RECENT_ANOMALIES)
+        self._generation = None
+        self._seq = 0
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _fold(self, history):
+        generation, rows, epochs = history.rows_since(self._seq, with_epochs=True)
+        if generation != self._generation:
+            self._generation, self._seq = generation, 0
+            self._stats = {}
+            self.anomalies.clear()
+            generation, rows, epochs = history.rows_since(0, with_epochs=True)
+
+        found = []
+        for row, epoch in zip(rows, epochs):
+            if epoch is None:
+                continue
+            for field in self.fields:
+                value = getattr(row, field)
+                if value is None:
+                    continue
+                stats = self._stats.get((row.sensor, field))
+                if stats is None:
+                    stats = self._stats[(row.sensor, field)] = RunningStats(self.windows)
+                z, ewma_z, anomaly = stats.add(epoch, value)
+                if anomaly:
+                    found.append({
+                        'timestamp_iso': row.timestamp_iso, 'sensor': row.sensor,
+                        'field': field, 'value': value, 'z': _round(z), 'ewma_z': _round(ewma_z),
+                    })
+        self._seq += len(rows)
+        self.anomalies.extend(found)
+        return found
+
+    def update(self, history):
+        """Fold in rows appended since the last call; returns the anomalies among them"""
+        with self._lock:
+            return self._fold(history)
+
+    def snapshot(self, history, sensor=None, fields=None):
+        """{sensor: {field: stats}} after catching up with storage"""
+        with self._lock:
+            self._fold(history)
+            out = {}
+            for (name, field), stats in sorted(self._stats.items()):
+                if (sensor is None or name == sensor) and (fields is None or field in fields):
+                    out.setdefault(name, {})[field] = stats.to_dict()
+            return out
+
+    def recent_anomalies(self, sensor=None):
+        with self._lock:
+            return [a for a in self.anomalies if sensor is None or a['sensor'] == sensor]
@@ -0,0 +1,206 @@
+"""
+Minimal Prometheus text-format metrics (counters, gauges, histograms).
+
+Each process keeps its own Registry. The scraper may run as a separate worker,
+so it writes its registry to METRICS_TEXTFILE after every cycle (the
+node_exporter textfile convention) and the server's /metrics appends that
+file to its own metrics. Fleet shards each write their own file (see
+shard_textfile), labelled with their member id, and read_textfiles merges
+them into one set of metric families.
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+import glob
+import os
+import threading
+import time
+
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "scraper_metrics.prom")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labels)
+
+    def render(self, const_labels=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        names, suffix = self.labels, ()
+        if const_labels:
+            names += tuple(const_labels)
+            suffix = tuple(str(v) for v in const_labels.values())
+        with self._lock:
+            for key in sorted(self._values):
+                lines.extend(self._samples(names, key + suffix, self._values[key]))
+        return lines
+
+    def _samples(self, names, key, value):
+        return [f"{self.name}{_format_labels(names, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, sum, count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, names, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_format_labels(names, key, le)} {cumulative}")
+        inf = 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{_format_labels(names, key, inf)} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(names, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(names, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self, const_labels=None):
+        """Text format; const_labels ({name: value}) are added to every sample"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(const_labels))
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path=METRICS_TEXTFILE, const_labels=None):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render(const_labels))
+        os.replace(tmp, path)
+
+
+def shard_textfile(member, path=METRICS_TEXTFILE):
+    """Per-member textfile next to path: scraper_metrics.prom -> scraper_metrics.<member>.prom"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{member}{ext}"
+
+
+def shard_textfiles(path=METRICS_TEXTFILE):
+    """{member: path} of the per-member textfiles next to path"""
+    root, ext = os.path.splitext(path)
+    files = {}
+    for filename in glob.glob(glob.escape(root) + ".*" + glob.escape(ext)):
+        member = filename[len(root) + 1:len(filename) - len(ext)]
+        if member:
+            files[member] = filename
+    return files
+
+
+def read_textfile(path=METRICS_TEXTFILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def read_textfiles(paths):
+    """
+    Several textfiles as one: each metric family's HELP/TYPE lines appear
+    once, followed by the samples of every file
+    """
+    families = {}  # name -> ({"HELP": line, "TYPE": line}, sample lines)
+    for path in paths:
+        family = None
+        for line in read_textfile(path).splitlines():
+            if line.startswith(("# HELP ", "# TYPE ")):
+                _, kind, family = line.split(" ", 3)[:3]
+                families.setdefault(family, ({}, []))[0].setdefault(kind, line)
+            elif line and not line.startswith("#"):
+                families.setdefault(family, ({}, []))[1].append(line)
+    lines = []
+    for header, samples in families.values():
+        lines.extend(header.values())
+        lines.extend(samples)
+    return "\n".join(lines) + "\n" if lines else ""
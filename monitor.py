@@ -1,175 +1,597 @@
-from playwright.sync_api import sync_playwright, TimeoutError
 import time
 import json
 from datetime import datetime, timedelta
+import contextlib
+import glob
+import gzip
+import hashlib
+import io
 import re
 import os
 import requests
-import csv
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, TimeoutError as FuturesTimeout
 
-# Dashboard URLs
-DASHBOARDS = {
-    "Sensor 1": "https://solisolcap.grafana.net/public-dashboards/5f813ad60cfd4d5495ee33fbac349c34",
-    "Sensor 2": "https://solisolcap.grafana.net/public-dashboards/36aa33cfd13c44d5a43422afa6fa1235",
-}
+from browser_pool import get_browser_pool, close_browser_pool, close_all_browser_pools, browser_rss_mb, format_pool_stats
+import grafana_api
+from storage import open_storage
+from scheduler import Scheduler
+from lease import ScraperLease, FileLock, file_signature
+from fleet import load_dashboards, open_shard, FLEET_SHARDING
+from alerts import AlertEngine, AlertDispatcher, open_sinks
+from metric_stats import MetricStats
+from metrics import Registry, shard_textfile
+
+# Dashboard URLs and per-dashboard scrape interval overrides in minutes (others
+# use --interval), from DASHBOARDS_CONFIG (see fleet.py)
+DASHBOARDS, DASHBOARD_INTERVALS = load_dashboards()
 
 DATA_FILE = "last_readings.json"
-ALERT_LOG = "alerts.log"
-CSV_FILE = "readings_history.csv"
 POLL_INTERVAL_MINUTES = 10
 
+# Concurrent scraping: number of dashboards loaded at once, and how long a
+# whole cycle may wait for slow dashboards before moving on without them
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "2"))
+SCRAPE_DEADLINE_SECONDS = int(os.getenv("SCRAPE_DEADLINE_SECONDS", "240"))
+
+# Render readiness: hard cap on waiting for panels and how often the page is
+# probed while waiting. Once a dashboard has READY_BUDGET_MIN_SAMPLES render
+# times in RENDER_TIMINGS_FILE, it waits READY_BUDGET_MARGIN x its slowest
+# recorded render instead, no less than READY_BUDGET_FLOOR_SECONDS
+READY_DEADLINE_SECONDS = float(os.getenv("READY_DEADLINE_SECONDS", "25"))
+READY_POLL_SECONDS = 0.5
+READY_BUDGET_MIN_SAMPLES = int(os.getenv("READY_BUDGET_MIN_SAMPLES", "5"))
+READY_BUDGET_MARGIN = float(os.getenv("READY_BUDGET_MARGIN", "1.5"))
+READY_BUDGET_FLOOR_SECONDS = float(os.getenv("READY_BUDGET_FLOOR_SECONDS", "5"))
+RENDER_TIMINGS_FILE = "render_timings.json"
+
+# "browser" renders dashboards in Chromium and scrapes the text,
+# "intercept" renders them but reads the panel query JSON Grafana fetches,
+# "api" pulls panel data as JSON from Grafana's public dashboard API
+FETCH_MODE = os.getenv("FETCH_MODE", "browser")
+
+# Change detection: skip extraction and the row write when a dashboard shows
+# the same content as at its last saved reading; with the heartbeat on, the
+# latest snapshot still records that the dashboard was checked
+CHANGE_DETECTION = os.getenv("CHANGE_DETECTION", "1") != "0"
+UNCHANGED_HEARTBEAT = os.getenv("UNCHANGED_HEARTBEAT", "1") != "0"
+
+# Watch mode only scrapes while holding the leader lease (see lease.py), so a
+# web process and a worker never both scrape the same dashboards. With
+# FLEET_SHARDING=1 the fleet is split between scrapers instead (see fleet.py)
+SCRAPER_LEASE = os.getenv("SCRAPER_LEASE", "1") != "0"
+
 TEMP_CRITICAL_LOW = 10.0
 TEMP_CRITICAL_HIGH = 38.0
 
 
-# -------- DASHBOARD SCRAPE --------
+# -------- METRICS --------
+
+# Scraper metrics, written to metrics.METRICS_TEXTFILE after every cycle for
+# the server's /metrics endpoint; fleet shards write their own file instead,
+# labelled scraper=<member id>
+SCRAPE_METRICS = Registry()
+_metrics_member = None
+PHASE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 25, 40, 60, 90)
+
+scrape_phase_seconds = SCRAPE_METRICS.histogram(
+    "scrape_phase_seconds", "Time spent per dashboard scrape phase",
+    ("dashboard", "phase"), PHASE_BUCKETS)
+scrape_seconds = SCRAPE_METRICS.histogram(
+    "scrape_seconds", "Whole dashboard fetch, by fetch mode", ("dashboard", "mode"), PHASE_BUCKETS)
+extraction_seconds = SCRAPE_METRICS.histogram(
+    "extraction_seconds", "Parameter extraction and metric parsing per reading", ("dashboard",))
+storage_write_seconds = SCRAPE_METRICS.histogram(
+    "storage_write_seconds", "Batched write of one cycle's readings", ("backend",))
+scrape_timeouts_total = SCRAPE_METRICS.counter(
+    "scrape_timeouts_total", "Scrapes that hit a time limit", ("dashboard", "kind"))
+scrape_failures_total = SCRAPE_METRICS.counter(
+    "scrape_failures_total", "Scrapes that raised an error", ("dashboard",))
+no_data_pages_total = SCRAPE_METRICS.counter(
+    "scrape_no_data_pages_total", "Rendered pages showing 'No data' indicators", ("dashboard",))
+data_quality_total = SCRAPE_METRICS.counter(
+    "data_quality_total", "Extracted readings by data quality outcome", ("dashboard", "quality"))
+browser_rss_bytes = SCRAPE_METRICS.gauge(
+    "browser_rss_bytes", "Resident memory of the browser processes the scraper launched")
+last_cycle_timestamp = SCRAPE_METRICS.gauge(
+    "scraper_last_cycle_timestamp_seconds", "When the last scrape cycle finished")
+
+
+def _timed(spent, phase, fn):
+    """Call fn, adding its duration to spent[phase]"""
+    start = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        spent[phase] = spent.get(phase, 0.0) + time.perf_counter() - start
+
+
+def record_scrape_failure(name, error):
+    scrape_failures_total.inc(dashboard=name)
+    if "Timeout" in type(error).__name__:
+        scrape_timeouts_total.inc(dashboard=name, kind="page")
+
+
+def write_scraper_metrics():
+    rss = browser_rss_mb()
+    if rss is not None:
+        browser_rss_bytes.set(int(rss * 1024 * 1024))
+    last_cycle_timestamp.set(time.time())
+    try:
+        if _metrics_member is None:
+            SCRAPE_METRICS.write_textfile()
+        else:
+            SCRAPE_METRICS.write_textfile(shard_textfile(_metrics_member), {'scraper': _metrics_member})
+    except OSError as e:
+        print(f"⚠️  Could not write scraper metrics: {e}")
+
+
+# -------- RENDER READINESS --------
 
-def get_dashboard_data(url, name="Dashboard"):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page(viewport={"width": 1920, "height": 1080})
+# Grafana's loading bar / spinner elements, present while a panel query is in flight
+PANEL_LOADING_SELECTOR = (
+    '[aria-label="Panel loading bar"], .panel-loading, '
+    '[data-testid="Spinner"], .fa-spinner'
+)
 
-        print(f"\n📡 Loading {name}...")
-        page.goto(url, timeout=60000)
+# A settled metric panel shows either a value with a unit or an empty-state message
+PANEL_VALUE_RE = re.compile(r'\d\s*(?:°C|%|[µuμ]S/cm|mg/L)|no data|field not found', re.IGNORECASE)
 
+_timings_lock = threading.Lock()
+
+
+def wait_for_panels(page, deadline_seconds, spent=None):
+    """
+    Probe the page until the metric panels hold values, then return its text.
+
+    Ready means: no Grafana loading indicators, at least one panel showing a
+    value (or an empty-state message), and identical body text on two
+    consecutive probes. Returns (text, seconds_waited, ready). Time spent
+    scrolling, probing, reading text and sleeping is added up in spent.
+    """
+    start = time.time()
+    previous = None
+    text = ""
+    spent = {} if spent is None else spent
+
+    while True:
+        try:
+            # Grafana only renders panels once scrolled into view
+            _timed(spent, "scroll", lambda: page.evaluate("window.scrollTo(0, document.body.scrollHeight)"))
+            loading = _timed(spent, "probe", lambda: page.locator(PANEL_LOADING_SELECTOR).count())
+            text = _timed(spent, "inner_text", lambda: page.locator("body").inner_text())
+        except Exception:
+            loading = 1
+
+        elapsed = time.time() - start
+        if not loading and text == previous and PANEL_VALUE_RE.search(text):
+            return text, elapsed, True
+        if elapsed >= deadline_seconds:
+            return text, elapsed, False
+
+        previous = text
+        _timed(spent, "poll_sleep", lambda: page.wait_for_timeout(READY_POLL_SECONDS * 1000))
+
+
+def _read_render_timings():
+    try:
+        with open(RENDER_TIMINGS_FILE, "r") as f:
+            timings = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return timings if isinstance(timings, dict) else {}
+
+
+def ready_budget(name):
+    """
+    Seconds to wait for a dashboard's panels: READY_BUDGET_MARGIN x its
+    slowest recorded render, between READY_BUDGET_FLOOR_SECONDS and
+    READY_DEADLINE_SECONDS. A render that ran out of budget records the
+    whole budget, so a dashboard that got slower earns a longer one.
+    """
+    t = _read_render_timings().get(name)
+    if not isinstance(t, dict) or t.get("samples", 0) < READY_BUDGET_MIN_SAMPLES:
+        return READY_DEADLINE_SECONDS
+    budget = t.get("max_s", READY_DEADLINE_SECONDS) * READY_BUDGET_MARGIN
+    return min(max(budget, READY_BUDGET_FLOOR_SECONDS), READY_DEADLINE_SECONDS)
+
+
+def record_render_timing(name, seconds, ready):
+    """
+    Keep per-dashboard render times in RENDER_TIMINGS_FILE for ready_budget().
+    Fleet shards share the file, so it is re-read and rewritten under its lock;
+    a failed write only warns, never failing the scrape.
+    """
+    with _timings_lock:
         try:
-            page.wait_for_load_state("networkidle", timeout=45000)
-        except TimeoutError:
-            page.wait_for_load_state("domcontentloaded", timeout=20000)
-            page.wait_for_timeout(3000)
+            with FileLock(RENDER_TIMINGS_FILE + ".lock"):
+                timings = _read_render_timings()
+
+                t = timings.setdefault(name, {"samples": 0, "timeouts": 0, "avg_s": 0.0, "max_s": 0.0})
+                t["samples"] += 1
+                if not ready:
+                    t["timeouts"] += 1
+                t["last_s"] = round(seconds, 2)
+                t["max_s"] = round(max(t["max_s"], seconds), 2)
+                t["avg_s"] = round(t["avg_s"] + (seconds - t["avg_s"]) / t["samples"], 2)
+                t["updated"] = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+
+                tmp = f"{RENDER_TIMINGS_FILE}.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(timings, f, indent=2)
+                os.replace(tmp, RENDER_TIMINGS_FILE)
+        except OSError as e:
+            print(f"⚠️  Could not record render timing for {name}: {e}")
+
+
+# -------- RESPONSE INTERCEPTION --------
+
+def _capture_response(response, captured):
+    """page.on("response") hook: keep Grafana's dashboard model and panel query responses"""
+    url = response.url
+    m = grafana_api.PANEL_QUERY_API_RE.search(url)
+    if m:
+        captured.setdefault("panels", {})[int(m.group("panel"))] = response
+    elif grafana_api.DASHBOARD_API_RE.search(url):
+        captured["dashboard"] = response
 
-        print("⏳ Waiting for panels to render...")
-        time.sleep(10)
+
+def _response_json(response):
+    try:
+        if response.ok:
+            return response.json()
+    except Exception:
+        pass
+    return None
+
+
+def wait_for_panel_queries(page, captured, deadline_seconds):
+    """
+    Wait until every query panel's response has been intercepted and map them to results.
+
+    Returns (results, seconds_waited); results is None when nothing usable was
+    captured, so the caller can fall back to text extraction.
+    """
+    start = time.time()
+    dashboard = None
+
+    while True:
+        if dashboard is None and "dashboard" in captured:
+            model = _response_json(captured["dashboard"]) or {}
+            dashboard = model.get("dashboard")
+
+        if dashboard is not None:
+            expected = {p.get("id") for p in grafana_api.query_panels(dashboard)}
+            if expected and expected <= set(captured.get("panels", {})):
+                break
+
+        if time.time() - start >= deadline_seconds:
+            break
 
         try:
-            for _ in range(5):
-                page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
-                time.sleep(1)
-                page.wait_for_load_state("networkidle")
-        except:
+            # Grafana only issues queries for panels scrolled into view
+            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        except Exception:
             pass
+        page.wait_for_timeout(250)
+
+    waited = time.time() - start
+    if dashboard is None:
+        return None, waited
+
+    payloads = {}
+    for panel_id, response in captured.get("panels", {}).items():
+        payload = _response_json(response)
+        if payload is not None:
+            payloads[panel_id] = payload
+
+    results = grafana_api.results_from_payloads(dashboard, payloads)
+    if all(results[k] == 'N/A' for k in results if not k.startswith('_') and k != 'Growing Parameters'):
+        return None, waited
+    return results, waited
+
+
+# -------- DASHBOARD SCRAPE --------
+
+def get_dashboard_data(url, name="Dashboard", pool=None, intercept=False):
+    """
+    Render a dashboard and return its body text.
+
+    With intercept=True the panel query responses Grafana fetches while loading
+    are captured and returned as a results dict instead; the rendered text is
+    only used when no panel data could be captured.
+    """
+    pool = pool or get_browser_pool()
+    spent = {}
+    opened = time.perf_counter()
+    try:
+        with pool.page() as page:
+            spent["page_open"] = time.perf_counter() - opened
+            captured = {}
+            if intercept:
+                page.on("response", lambda response: _capture_response(response, captured))
+
+            print(f"\n📡 Loading {name}...")
+            _timed(spent, "goto", lambda: page.goto(url, timeout=60000, wait_until="domcontentloaded"))
+
+            budget = ready_budget(name)
+
+            if intercept:
+                results, waited = _timed(spent, "intercept_wait",
+                                         lambda: wait_for_panel_queries(page, captured, budget))
+                if results is not None:
+                    record_render_timing(name, waited, True)
+                    print(f"   ✓ Captured {len(captured.get('panels', {}))} panel queries after {waited:.1f}s")
+                    return results
+                scrape_timeouts_total.inc(dashboard=name, kind="intercept")
+                print("   ⚠️  No panel data intercepted, falling back to text extraction")
+                budget = max(budget - waited, READY_POLL_SECONDS * 2)
+
+            print("⏳ Waiting for panels to render...")
+            all_text, waited, ready = wait_for_panels(page, budget, spent)
+            record_render_timing(name, waited, ready)
+
+            if ready:
+                print(f"   ✓ Panels ready after {waited:.1f}s")
+            else:
+                scrape_timeouts_total.inc(dashboard=name, kind="render")
+                print(f"   ⚠️  Panels not settled after {waited:.1f}s budget, using current content")
+
+            # Check for "No data" indicators
+            if "no data" in all_text.lower():
+                no_data_count = all_text.lower().count("no data")
+                no_data_pages_total.inc(dashboard=name)
+                print(f"   ⚠️  WARNING: Found {no_data_count} 'No data' indicator(s) on dashboard")
+            
+            return all_text
+    finally:
+        for phase, seconds in spent.items():
+            scrape_phase_seconds.observe(seconds, dashboard=name, phase=phase)
+
+
+def fetch_dashboard(url, name="Dashboard", mode=None):
+    """Page text in browser mode, a ready-made results dict in api/intercept mode"""
+    mode = mode or FETCH_MODE
+    with scrape_seconds.time(dashboard=name, mode=mode):
+        if mode == "api":
+            return grafana_api.fetch_results(url, name)
+        return get_dashboard_data(url, name, intercept=(mode == "intercept"))
 
-        all_text = page.locator("body").inner_text()
-        browser.close()
-        
-        # Check for "No data" indicators
-        if "no data" in all_text.lower():
-            no_data_count = all_text.lower().count("no data")
-            print(f"   ⚠️  WARNING: Found {no_data_count} 'No data' indicator(s) on dashboard")
-        
-        return all_text
+
+# -------- CHANGE DETECTION --------
+
+# Lines that follow the clock rather than the data: graph axis ticks, relative ages
+VOLATILE_LINE_RE = re.compile(
+    r'^(?:\d{1,2}:\d{2}(?::\d{2})?|\d+\s+(?:second|minute|hour|day)s?\s+ago|now)$',
+    re.IGNORECASE)
+
+_change_stats = {'changed': 0, 'unchanged': 0}
+
+
+def content_digest(payload):
+    """Hash of a dashboard's normalized content (page text or results dict)"""
+    if isinstance(payload, dict):
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    else:
+        lines = (" ".join(line.split()) for line in payload.splitlines())
+        raw = "\n".join(line for line in lines if line and not VOLATILE_LINE_RE.match(line))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def content_changed(sensor_name, digest):
+    """Compare with the digest stored alongside the sensor's last saved reading"""
+    previous = _load_latest_snapshot().get(sensor_name, {}).get('content_hash')
+    changed = previous != digest
+    _change_stats['changed' if changed else 'unchanged'] += 1
+    return changed
+
+
+def format_change_stats():
+    return f"{_change_stats['changed']} changed, {_change_stats['unchanged']} unchanged (skipped)"
 
 
 # -------- FIXED PARAMETER EXTRACTION --------
 
-def extract_parameters(page_text):
-    results = {
-        'Growing Parameters': 'N/A',
-        'Temperature': 'N/A',
-        'Moisture': 'N/A',
-        'Electric Conductivity': 'N/A',
-        'Acidity': 'N/A',
-        'Nitrogen': 'N/A',
-        'Phosphorus': 'N/A',
-        'Potassium': 'N/A',
-        '_data_quality': 'GOOD'  # Track data quality
-    }
+# The page text is indexed once, recording where every label or unit literal
+# occurs. Each extraction pattern is compiled once and only tried where its
+# literal occurs -- anchored at the literal when the pattern starts with it,
+# or searched from just before the first occurrence when a number leads.
+# Results are identical to searching the whole text with each pattern.
 
-    # Check for global "No data" or offline indicators
-    if "no data" in page_text.lower() or "field not found" in page_text.lower():
-        no_data_indicators = page_text.lower().count("no data") + page_text.lower().count("field not found")
-        if no_data_indicators > 3:
-            results['_data_quality'] = 'POOR_NO_DATA'
-            print(f"   ⚠️  Data quality warning: {no_data_indicators} 'no data'/'field not found' indicators detected")
+_ANCHOR_LITERALS = (
+    'i_nitrogen', 'j_phosphorus', 'k_potassium', 'growing', 'temperature', 'moisture',
+    'electric', 'acidity', 'nitrogen', 'phosphorus', 'potassium', 'mg/l', '°c',
+    'µs/cm', 'us/cm', 'μs/cm', 'ph', 'ec',
+)
+_UNIT_SPELLINGS = ('µs/cm', 'us/cm', 'μs/cm')
 
-    if re.search(r'GROWING\s*PARAMETERS', page_text, re.IGNORECASE):
-        results['Growing Parameters'] = '✓ Section Found'
+# str.lower() agrees with re.IGNORECASE on ASCII and these characters; any
+# other character sends indexing through the (slower) regex scan
+_LOWER_UNSAFE_RE = re.compile(r'[^\x00-\x7f°µμΜ]')
+_ANCHOR_RE = re.compile(
+    r'(?=(i_nitrogen|j_phosphorus|k_potassium|growing|temperature|moisture|electric'
+    r'|acidity|nitrogen|phosphorus|potassium|mg/l|°c|[µuμ]s/cm|ph|ec))',
+    re.IGNORECASE
+)
 
-    # EC
-    ec_patterns = [
-        r'(\d{1,5})\s*[µuμ]S/cm',
-        r'Electric\s*Conductivity[:\s]*(\d{1,5})',
-        r'\bEC\b[:\s]*(\d{1,5})',
-    ]
+# Characters that may sit between a leading number and its label
+_NUMBER_TAIL = set(".%/mgkplMGKPL\u212a")
+
+_NUM = r'(\d+\.?\d*)'
+_PH_NUM = r'([0-9]+(?:\.[0-9]{1,2})?)'
+
+
+def _compile_rules(rules):
+    """Rules are (pattern, anchor literal, number leads the literal)"""
+    return [(re.compile(p, re.IGNORECASE), anchor, leads) for p, anchor, leads in rules]
+
+
+_EC_RULES = _compile_rules([
+    (r'(\d{1,5})\s*[µuμ]S/cm', 'us/cm', True),
+    (r'Electric\s*Conductivity[:\s]*(\d{1,5})', 'electric', False),
+    (r'\bEC\b[:\s]*(\d{1,5})', 'ec', False),
+])
+_TEMP_RULES = _compile_rules([
+    (_NUM + r'\s*°C', '°c', True),
+    (r'\bTemperature\b[:\s]*' + _NUM, 'temperature', False),
+])
+_MOISTURE_RULES = _compile_rules([
+    (r'\bMoisture\b[:\s]*' + _NUM + r'\s*%', 'moisture', False),
+    (_NUM + r'\s*%\s*\bMoisture\b', 'moisture', True),
+])
+_PH_RULES = _compile_rules([
+    (r'\bpH\b[:\s]*' + _PH_NUM, 'ph', False),
+    (_PH_NUM + r'\s*\bpH\b', 'ph', True),
+    (r'\bAcidity\b[:\s]*' + _PH_NUM, 'acidity', False),
+])
+
+
+def _npk_rules(word, field):
+    return _compile_rules([
+        (r'\b' + word + r'\b[:\s]*' + _NUM + r'\s*(?:mg/kg|ppm|mg/L)?', word.lower(), False),
+        (word.upper() + r'[:\s]*' + _NUM, word.lower(), False),
+        (field + r'.*?' + _NUM + r'\s*(?:mg/kg|ppm|mg/L)', field, False),
+        (_NUM + r'\s*(?:mg/kg|ppm|mg/L)?\s*' + word, word.lower(), True),
+    ])
+
+
+# results key -> (rules, field-name label, plain label)
+_NPK_RULES = {
+    'Nitrogen': (_npk_rules('Nitrogen', 'i_nitrogen'), 'i_nitrogen', 'nitrogen'),
+    'Phosphorus': (_npk_rules('Phosphorus', 'j_phosphorus'), 'j_phosphorus', 'phosphorus'),
+    'Potassium': (_npk_rules('Potassium', 'k_potassium'), 'k_potassium', 'potassium'),
+}
+
+_GROWING_RE = re.compile(r'GROWING\s*PARAMETERS', re.IGNORECASE)
+_NPK_SECTION_RE = re.compile(r'GROWING PARAMETERS.*?(?=TEMPERATURE|$)', re.DOTALL | re.IGNORECASE)
+_MG_L_RE = re.compile(_NUM + r'\s*mg/L', re.IGNORECASE)
+_PH_WINDOW_RE = re.compile(_PH_NUM)
+
+
+def index_page_text(page_text, lowered=None):
+    """Map each label/unit literal (lowercase) to the sorted positions where it occurs"""
+    index = {}
+
+    if _LOWER_UNSAFE_RE.search(page_text):
+        for m in _ANCHOR_RE.finditer(page_text):
+            key = m.group(1).lower()
+            if key.endswith('s/cm'):
+                key = 'us/cm'
+            index.setdefault(key, []).append(m.start())
+            if key == 'phosphorus':
+                index.setdefault('ph', []).append(m.start())
+        return index
+
+    if lowered is None:
+        lowered = page_text.lower()
+    for literal in _ANCHOR_LITERALS:
+        pos = lowered.find(literal)
+        while pos != -1:
+            index.setdefault(literal, []).append(pos)
+            pos = lowered.find(literal, pos + 1)
+
+    units = [p for spelling in _UNIT_SPELLINGS for p in index.pop(spelling, ())]
+    if units:
+        index['us/cm'] = sorted(units)
+    return index
 
-    for p in ec_patterns:
-        m = re.search(p, page_text, re.IGNORECASE)
+
+def _backscan(text, pos):
+    while pos > 0:
+        c = text[pos - 1]
+        if not (c.isspace() or c.isdecimal() or c in _NUMBER_TAIL):
+            break
+        pos -= 1
+    return pos
+
+
+def _first_match(text, index, rule):
+    regex, anchor, leads = rule
+    positions = index.get(anchor)
+    if not positions:
+        return None
+    if leads:
+        return regex.search(text, _backscan(text, positions[0]))
+    for pos in positions:
+        m = regex.match(text, pos)
+        if m:
+            return m
+    return None
+
+
+def _label_hits(index, field, word):
+    """(start, end) of each non-overlapping field/word label, field spelling first"""
+    fields = set(index.get(field, ()))
+    hits = [(p, p + len(field)) for p in fields]
+    offset = len(field) - len(word)
+    hits += [(p, p + len(word)) for p in index.get(word, ()) if p - offset not in fields]
+    return sorted(hits)
+
+
+def _extract_ec(page_text, index, results):
+    for rule in _EC_RULES:
+        m = _first_match(page_text, index, rule)
         if m:
             results['Electric Conductivity'] = f"{m.group(1)} µS/cm"
             break
 
-    # Temperature
-    temp_patterns = [
-        r'(\d+\.?\d*)\s*°C',
-        r'\bTemperature\b[:\s]*(\d+\.?\d*)',
-    ]
 
-    for p in temp_patterns:
-        m = re.search(p, page_text, re.IGNORECASE)
+def _extract_temperature(page_text, index, results):
+    for rule in _TEMP_RULES:
+        m = _first_match(page_text, index, rule)
         if m:
             results['Temperature'] = f"{m.group(1)} °C"
             break
 
-    # Moisture
-    moisture_patterns = [
-        r'\bMoisture\b[:\s]*(\d+\.?\d*)\s*%',
-        r'(\d+\.?\d*)\s*%\s*\bMoisture\b',
-    ]
 
-    for p in moisture_patterns:
-        m = re.search(p, page_text, re.IGNORECASE)
+def _extract_moisture(page_text, index, results):
+    for rule in _MOISTURE_RULES:
+        m = _first_match(page_text, index, rule)
         if m:
             results['Moisture'] = f"{m.group(1)} %"
             break
 
-    # pH with fallback logic
-    ph_patterns = [
-        r'\bpH\b[:\s]*([0-9]+(?:\.[0-9]{1,2})?)',
-        r'([0-9]+(?:\.[0-9]{1,2})?)\s*\bpH\b',
-        r'\bAcidity\b[:\s]*([0-9]+(?:\.[0-9]{1,2})?)',
-        r'\bACIDITY\b[:\s]*([0-9]+(?:\.[0-9]{1,2})?)',
-    ]
 
+def _extract_ph(page_text, index, results):
     ph_value = None
 
-    for p in ph_patterns:
-        m = re.search(p, page_text, re.IGNORECASE)
+    for rule in _PH_RULES:
+        m = _first_match(page_text, index, rule)
         if m:
-            try:
-                v = float(m.group(1))
-                if 0 < v <= 14:
-                    ph_value = v
-                    break
-            except:
-                pass
+            v = float(m.group(1))
+            if 0 < v <= 14:
+                ph_value = v
+                break
 
+    # Fallback: first number within 40 chars of a pH/Acidity label
     if ph_value is None:
-        for tag in ['pH', 'Acidity', 'ACIDITY']:
-            for hit in re.finditer(tag, page_text, re.IGNORECASE):
-                window = page_text[max(0, hit.start()-40):hit.end()+40]
-                num = re.search(r'([0-9]+(?:\.[0-9]{1,2})?)', window)
+        for tag in ('ph', 'acidity'):
+            for start in index.get(tag, ()):
+                num = _PH_WINDOW_RE.search(page_text, max(0, start-40), start + len(tag) + 40)
                 if num:
-                    try:
-                        v = float(num.group(1))
-                        if 0 < v <= 14:
-                            ph_value = v
-                            break
-                    except:
-                        pass
+                    v = float(num.group(1))
+                    if 0 < v <= 14:
+                        ph_value = v
+                        break
             if ph_value is not None:
                 break
 
     if ph_value is not None:
         results['Acidity'] = f"{ph_value:.2f} pH"
 
+
+def _extract_npk(page_text, index, results):
     # Special handling for Grafana NPK layout: N, K, values, P pattern
     # Look for pattern where N/K/P letters appear near mg/L values
-    npk_section = re.search(r'GROWING PARAMETERS.*?(?=TEMPERATURE|$)', page_text, re.DOTALL | re.IGNORECASE)
+    npk_section = None
+    for pos in index.get('growing', ()):
+        npk_section = _NPK_SECTION_RE.match(page_text, pos)
+        if npk_section:
+            break
     if npk_section:
-        npk_text = npk_section.group()
         # Extract all mg/L values in order
-        mg_values = re.findall(r'(\d+\.?\d*)\s*mg/L', npk_text, re.IGNORECASE)
+        mg_values = _MG_L_RE.findall(page_text, npk_section.start(), npk_section.end())
         
         print(f"   🧪 NPK extraction: Found {len(mg_values)} mg/L values: {mg_values}")
         
@@ -190,104 +612,68 @@ def extract_parameters(page_text):
         else:
             print(f"   ⚠️  No NPK values found in GROWING PARAMETERS section")
 
-    # Fallback: Nitrogen (N) patterns
-    if results['Nitrogen'] == 'N/A':
-        n_patterns = [
-            r'\bNitrogen\b[:\s]*(\d+\.?\d*)\s*(?:mg/kg|ppm|mg/L)?',
-            r'NITROGEN[:\s]*(\d+\.?\d*)',
-            r'i_nitrogen.*?(\d+\.?\d*)\s*(?:mg/kg|ppm|mg/L)',
-            r'(\d+\.?\d*)\s*(?:mg/kg|ppm|mg/L)?\s*Nitrogen',
-        ]
-        for p in n_patterns:
-            m = re.search(p, page_text, re.IGNORECASE)
-            if m:
-                try:
-                    val = float(m.group(1))
-                    if 0 < val < 10000:
-                        results['Nitrogen'] = f"{val} mg/kg"
-                        break
-                except:
-                    pass
-
-    # Fallback: search near "i_nitrogen" label
-    if results['Nitrogen'] == 'N/A':
-        for hit in re.finditer(r'i_nitrogen|Nitrogen|NITROGEN', page_text, re.IGNORECASE):
-            window = page_text[max(0, hit.start()-80):hit.end()+80]
-            nums = re.findall(r'(\d+\.?\d*)\s*mg/L', window, re.IGNORECASE)
-            if nums:
-                try:
-                    val = float(nums[0])
-                    if 0 < val < 10000:
-                        results['Nitrogen'] = f"{val} mg/kg"
-                        break
-                except:
-                    pass
-
-    # Fallback: Phosphorus (P) patterns
-    if results['Phosphorus'] == 'N/A':
-        p_patterns = [
-            r'\bPhosphorus\b[:\s]*(\d+\.?\d*)\s*(?:mg/kg|ppm|mg/L)?',
-            r'PHOSPHORUS[:\s]*(\d+\.?\d*)',
-            r'j_phosphorus.*?(\d+\.?\d*)\s*(?:mg/kg|ppm|mg/L)',
-            r'(\d+\.?\d*)\s*(?:mg/kg|ppm|mg/L)?\s*Phosphorus',
-        ]
-        for p in p_patterns:
-            m = re.search(p, page_text, re.IGNORECASE)
-            if m:
-                try:
-                    val = float(m.group(1))
-                    if 0 < val < 10000:
-                        results['Phosphorus'] = f"{val} mg/kg"
-                        break
-                except:
-                    pass
-
-    # Fallback: search near "j_phosphorus" label
-    if results['Phosphorus'] == 'N/A':
-        for hit in re.finditer(r'j_phosphorus|Phosphorus|PHOSPHORUS', page_text, re.IGNORECASE):
-            window = page_text[max(0, hit.start()-80):hit.end()+80]
-            nums = re.findall(r'(\d+\.?\d*)\s*mg/L', window, re.IGNORECASE)
-            if nums:
-                try:
-                    val = float(nums[0])
-                    if 0 < val < 10000:
-                        results['Phosphorus'] = f"{val} mg/kg"
-                        break
-                except:
-                    pass
-
-    # Fallback: Potassium (K) patterns
-    if results['Potassium'] == 'N/A':
-        k_patterns = [
-            r'\bPotassium\b[:\s]*(\d+\.?\d*)\s*(?:mg/kg|ppm|mg/L)?',
-            r'POTASSIUM[:\s]*(\d+\.?\d*)',
-            r'k_potassium.*?(\d+\.?\d*)\s*(?:mg/kg|ppm|mg/L)',
-            r'(\d+\.?\d*)\s*(?:mg/kg|ppm|mg/L)?\s*Potassium',
-        ]
-        for p in k_patterns:
-            m = re.search(p, page_text, re.IGNORECASE)
+    # Fallback: labelled patterns, then the first mg/L value within 80 chars of a label
+    for key, (rules, field, word) in _NPK_RULES.items():
+        if results[key] != 'N/A':
+            continue
+
+        for rule in rules:
+            m = _first_match(page_text, index, rule)
             if m:
-                try:
-                    val = float(m.group(1))
-                    if 0 < val < 10000:
-                        results['Potassium'] = f"{val} mg/kg"
-                        break
-                except:
-                    pass
-
-    # Fallback: search near "k_potassium" label
-    if results['Potassium'] == 'N/A':
-        for hit in re.finditer(r'k_potassium|Potassium|POTASSIUM', page_text, re.IGNORECASE):
-            window = page_text[max(0, hit.start()-80):hit.end()+80]
-            nums = re.findall(r'(\d+\.?\d*)\s*mg/L', window, re.IGNORECASE)
-            if nums:
-                try:
-                    val = float(nums[0])
-                    if 0 < val < 10000:
-                        results['Potassium'] = f"{val} mg/kg"
-                        break
-                except:
-                    pass
+                val = float(m.group(1))
+                if 0 < val < 10000:
+                    results[key] = f"{val} mg/kg"
+                    break
+
+        if results[key] != 'N/A' or 'mg/l' not in index:
+            continue
+
+        for start, end in _label_hits(index, field, word):
+            num = _MG_L_RE.search(page_text, max(0, start-80), end + 80)
+            if num:
+                val = float(num.group(1))
+                if 0 < val < 10000:
+                    results[key] = f"{val} mg/kg"
+                    break
+
+
+# Extraction stages in the order they run; each fills its keys of the results dict
+EXTRACTORS = [
+    ('Electric Conductivity', _extract_ec),
+    ('Temperature', _extract_temperature),
+    ('Moisture', _extract_moisture),
+    ('Acidity', _extract_ph),
+    ('NPK', _extract_npk),
+]
+
+
+def extract_parameters(page_text):
+    results = {
+        'Growing Parameters': 'N/A',
+        'Temperature': 'N/A',
+        'Moisture': 'N/A',
+        'Electric Conductivity': 'N/A',
+        'Acidity': 'N/A',
+        'Nitrogen': 'N/A',
+        'Phosphorus': 'N/A',
+        'Potassium': 'N/A',
+        '_data_quality': 'GOOD'  # Track data quality
+    }
+
+    lowered = page_text.lower()
+    index = index_page_text(page_text, lowered)
+
+    # Check for global "No data" or offline indicators
+    no_data_indicators = lowered.count("no data") + lowered.count("field not found")
+    if no_data_indicators > 3:
+        results['_data_quality'] = 'POOR_NO_DATA'
+        print(f"   ⚠️  Data quality warning: {no_data_indicators} 'no data'/'field not found' indicators detected")
+
+    if any(_GROWING_RE.match(page_text, pos) for pos in index.get('growing', ())):
+        results['Growing Parameters'] = '✓ Section Found'
+
+    for _, extractor in EXTRACTORS:
+        extractor(page_text, index, results)
 
     return results
 
@@ -343,65 +729,257 @@ def validate_metrics(metrics, sensor_name):
     return True
 
 
-# -------- CSV SAVE --------
+# -------- STORAGE --------
 
-def save_to_csv(sensor_name, metrics):
-    file_exists = os.path.isfile(CSV_FILE)
-    
-    # Validate before saving
+CSV_HEADER = [
+    'timestamp_iso', 'sensor', 'temperature_c', 'moisture_pct',
+    'ec_us_cm', 'ph', 'nitrogen', 'phosphorus', 'potassium',
+    'temperature_status', 'moisture_status',
+    'ec_status', 'ph_status', 'overall_status'
+]
+
+_latest_snapshot = None
+_snapshot_signature = None
+# Snapshot entries changed by this process and not yet merged into DATA_FILE
+_snapshot_updates = {}
+_storage = None
+# Content digests of rows queued this cycle, stored with them at flush time
+_pending_hashes = {}
+# Recorded fetch times of replayed rows, by (sensor, timestamp_iso)
+_pending_saved_at = {}
+# Metrics of scraped rows, checked against the alert rules once the row is stored
+_pending_alerts = {}
+# Leader lease held by watch mode; rows are only written while it is held
+_scraper_lease = None
+# Online per-sensor stats, caught up with storage after every write
+_metric_stats = None
+
+
+def _read_latest_snapshot():
+    try:
+        with open(DATA_FILE, "r") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # Drop anything not in the per-sensor layout (e.g. the old {"sensors": ...} file)
+    if not isinstance(snapshot, dict):
+        return {}
+    return {k: v for k, v in snapshot.items() if isinstance(v, dict) and 'timestamp_iso' in v}
+
+
+def _load_latest_snapshot():
+    """
+    DATA_FILE as last written by any scraper, plus this process's unwritten
+    entries. Re-read whenever the file was replaced, so fleet shards see each
+    other's sensors (and content hashes) after a dashboard moves between them.
+    """
+    global _latest_snapshot, _snapshot_signature
+    signature = file_signature(DATA_FILE)
+    if _latest_snapshot is None or signature != _snapshot_signature:
+        _latest_snapshot = _read_latest_snapshot()
+        _latest_snapshot.update(_snapshot_updates)
+        _snapshot_signature = signature
+    return _latest_snapshot
+
+
+def _write_latest_snapshot():
+    """Merge this process's updated entries into DATA_FILE under its lock"""
+    global _latest_snapshot, _snapshot_signature
+    if not _snapshot_updates:
+        return
+    with FileLock(DATA_FILE + ".lock"):
+        snapshot = _read_latest_snapshot()
+        for sensor_name, entry in _snapshot_updates.items():
+            current = snapshot.get(sensor_name)
+            # Another scraper may have saved a newer reading meanwhile
+            if current is None or current['timestamp_iso'] <= entry['timestamp_iso']:
+                snapshot[sensor_name] = entry
+        tmp = DATA_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp, DATA_FILE)
+        _snapshot_signature = file_signature(DATA_FILE)
+    _latest_snapshot = snapshot
+    _snapshot_updates.clear()
+
+
+def update_latest_snapshot(sensor_name, row, content_hash=None, write=True, saved_at=None):
+    """
+    Record a sensor's newest row in DATA_FILE so the server can answer
+    /api/latest without querying storage. The file is replaced atomically;
+    write=False leaves that to a later call (one write per batch).
+
+    saved_at defaults to now; replayed rows pass their recorded fetch time.
+    A row older than the sensor's current entry is ignored, so replaying
+    old recordings never makes stale readings look current.
+    """
+    snapshot = _load_latest_snapshot()
+    entry = {col: str(value) for col, value in zip(CSV_HEADER, row)}
+    current = snapshot.get(sensor_name)
+    if current is not None and current['timestamp_iso'] > entry['timestamp_iso']:
+        return
+    entry['saved_at'] = entry['checked_at'] = saved_at or time.time()
+    entry['unchanged_checks'] = 0
+    if content_hash:
+        entry['content_hash'] = content_hash
+    snapshot[sensor_name] = _snapshot_updates[sensor_name] = entry
+    if write:
+        _write_latest_snapshot()
+
+
+def record_heartbeat(sensor_name):
+    """Note in the snapshot that an unchanged dashboard was checked, without a new row"""
+    entry = _load_latest_snapshot().get(sensor_name)
+    if entry is None:
+        return
+    entry['checked_at'] = time.time()
+    entry['unchanged_checks'] = entry.get('unchanged_checks', 0) + 1
+    _snapshot_updates[sensor_name] = entry
+    _write_latest_snapshot()
+
+
+def get_storage():
+    """Storage backend the scraper writes to, opened on first use"""
+    global _storage
+    if _storage is None:
+        _storage = open_storage()
+    return _storage
+
+
+def save_reading(sensor_name, metrics, content_hash=None, timestamp=None, saved_at=None):
+    """
+    Validate and queue a sensor's row; flush_readings() writes the cycle.
+    timestamp (ISO) overrides the reading time and saved_at (epoch) the time
+    it was fetched, e.g. when replaying recordings. Returns the queued row.
+    """
     is_valid = validate_metrics(metrics, sensor_name)
     
-    with open(CSV_FILE, mode='a', newline='') as f:
-        writer = csv.writer(f)
-        
-        if not file_exists:
-            writer.writerow([
-                'timestamp_iso', 'sensor', 'temperature_c', 'moisture_pct',
-                'ec_us_cm', 'ph', 'nitrogen', 'phosphorus', 'potassium',
-                'temperature_status', 'moisture_status',
-                'ec_status', 'ph_status', 'overall_status'
-            ])
-        
-        temp = metrics.get('temperature_c')
-        moisture = metrics.get('moisture_pct')
-        ec = metrics.get('ec_us_cm')
-        ph = metrics.get('acidity_ph')
-        nitrogen = metrics.get('nitrogen')
-        phosphorus = metrics.get('phosphorus')
-        potassium = metrics.get('potassium')
-        
-        # Determine status
-        temp_status = 'OK'
-        if temp is not None:
-            if temp < TEMP_CRITICAL_LOW or temp > TEMP_CRITICAL_HIGH:
-                temp_status = 'CRITICAL'
-        
-        moisture_status = 'OK' if moisture is not None else 'NA'
-        ec_status = 'OK' if ec is not None else 'NA'
-        ph_status = 'OK' if ph is not None else 'NA'
-        
-        statuses = [temp_status, moisture_status, ec_status, ph_status]
-        overall_status = 'CRITICAL' if 'CRITICAL' in statuses else 'OK'
-        
-        writer.writerow([
-            datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
-            sensor_name,
-            temp if temp is not None else 'NA',
-            moisture if moisture is not None else 'NA',
-            ec if ec is not None else 'NA',
-            ph if ph is not None else 'NA',
-            nitrogen if nitrogen is not None else 'NA',
-            phosphorus if phosphorus is not None else 'NA',
-            potassium if potassium is not None else 'NA',
-            temp_status,
-            moisture_status,
-            ec_status,
-            ph_status,
-            overall_status
-        ])
+    temp = metrics.get('temperature_c')
+    moisture = metrics.get('moisture_pct')
+    ec = metrics.get('ec_us_cm')
+    ph = metrics.get('acidity_ph')
+    nitrogen = metrics.get('nitrogen')
+    phosphorus = metrics.get('phosphorus')
+    potassium = metrics.get('potassium')
+    
+    # Determine status
+    temp_status = 'OK'
+    if temp is not None:
+        if temp < TEMP_CRITICAL_LOW or temp > TEMP_CRITICAL_HIGH:
+            temp_status = 'CRITICAL'
+    
+    moisture_status = 'OK' if moisture is not None else 'NA'
+    ec_status = 'OK' if ec is not None else 'NA'
+    ph_status = 'OK' if ph is not None else 'NA'
+    
+    statuses = [temp_status, moisture_status, ec_status, ph_status]
+    overall_status = 'CRITICAL' if 'CRITICAL' in statuses else 'OK'
+    
+    row = [
+        timestamp or datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+        sensor_name,
+        temp if temp is not None else 'NA',
+        moisture if moisture is not None else 'NA',
+        ec if ec is not None else 'NA',
+        ph if ph is not None else 'NA',
+        nitrogen if nitrogen is not None else 'NA',
+        phosphorus if phosphorus is not None else 'NA',
+        potassium if potassium is not None else 'NA',
+        temp_status,
+        moisture_status,
+        ec_status,
+        ph_status,
+        overall_status
+    ]
+
+    get_storage().add(row)
+    if content_hash:
+        _pending_hashes[sensor_name] = content_hash
+    if saved_at:
+        _pending_saved_at[(sensor_name, row[0])] = saved_at
     
     status_badge = '✓' if is_valid else '⚠️'
-    print(f"   {status_badge} Saved to {CSV_FILE}")
+    print(f"   {status_badge} Queued for {get_storage().describe()}")
+    return row
+
+
+def flush_readings():
+    """
+    Write every row queued this cycle in one batch, then refresh the latest
+    snapshot and check the stored rows against the alert rules
+    """
+    storage = get_storage()
+    if _scraper_lease is not None and not _scraper_lease.held():
+        dropped = storage.discard()
+        _pending_hashes.clear()
+        _pending_saved_at.clear()
+        _pending_alerts.clear()
+        if dropped:
+            print(f"\n⚠️  Scraper lease lost, dropped {len(dropped)} queued reading(s)")
+        return []
+    stats = get_metric_stats(storage)
+    try:
+        with storage_write_seconds.time(backend=storage.name):
+            rows = storage.flush()
+    except Exception:
+        # Nothing was stored, so nothing is alerted on
+        _pending_alerts.clear()
+        raise
+    for row in rows:
+        update_latest_snapshot(row[1], row, _pending_hashes.pop(row[1], None), write=False,
+                               saved_at=_pending_saved_at.pop((row[1], row[0]), None))
+    _write_latest_snapshot()
+    for row in rows:
+        metrics = _pending_alerts.pop((row[1], row[0]), None)
+        if metrics is None:
+            continue
+        try:
+            get_alert_engine().evaluate(row[1], metrics)
+        except Exception as e:
+            print(f"⚠️  {row[1]}: alert check failed: {e}")
+    if rows:
+        print(f"\n💾 Saved {len(rows)} reading(s) to {storage.describe()}")
+        report_anomalies(stats, storage)
+    return rows
+
+
+def get_metric_stats(storage):
+    """Online stats, folded silently over the history already stored on first use"""
+    global _metric_stats
+    if _metric_stats is None:
+        _metric_stats = MetricStats()
+        _metric_stats.update(storage)
+    return _metric_stats
+
+
+def report_anomalies(stats, storage):
+    """Fold newly saved rows into the online stats and print any outliers among them"""
+    for a in stats.update(storage):
+        z = f"z={a['z']:+.1f}" if a['z'] is not None else "z=n/a"
+        ewma_z = f"ewma={a['ewma_z']:+.1f}σ" if a['ewma_z'] is not None else "ewma=n/a"
+        print(f"   📐 Anomaly: {a['sensor']} {a['field']} = {a['value']} ({z}, {ewma_z})")
+
+
+# -------- ALERTS --------
+
+_alert_engine = None
+
+
+def get_alert_engine():
+    """Alert rules (see alerts.py) with their delivery worker, started on first use"""
+    global _alert_engine
+    if _alert_engine is None:
+        _alert_engine = AlertEngine(AlertDispatcher(open_sinks()))
+    return _alert_engine
+
+
+def close_alerts():
+    """Persist rule state and deliver alerts still queued"""
+    global _alert_engine
+    if _alert_engine is not None:
+        _alert_engine.save()
+        _alert_engine.dispatcher.close()
+        _alert_engine = None
 
 
 # -------- TERMINAL DISPLAY --------
@@ -436,57 +1014,382 @@ def display_terminal(sensor, results, metrics):
     print("-"*50)
 
 
+# -------- CONCURRENT SCRAPE --------
+
+_scrape_executor = None
+_scrape_workers = 0
+POOL_CLOSE_TIMEOUT = 10
+
+
+def _close_worker_pools(executor, workers, timeout=POOL_CLOSE_TIMEOUT):
+    """Have each worker thread close its own browser pool (Playwright objects are thread-bound)"""
+    # Every task waits for the others, so each one runs on a different worker
+    barrier = threading.Barrier(workers)
+
+    def close():
+        try:
+            barrier.wait(timeout)
+        except threading.BrokenBarrierError:
+            pass
+        close_browser_pool()
+
+    wait([executor.submit(close) for _ in range(workers)], timeout=2 * timeout)
+
+
+def _stop_scrape_executor():
+    global _scrape_executor
+    if _scrape_executor is None:
+        return
+    _close_worker_pools(_scrape_executor, _scrape_workers)
+    _scrape_executor.shutdown(wait=False)
+    _scrape_executor = None
+    # A worker stuck in a scrape never got to close its pool: kill its browser
+    close_all_browser_pools(include_own=False)
+
+
+def _get_scrape_executor(workers):
+    """Worker threads live across cycles so each keeps its pooled browser warm"""
+    global _scrape_executor, _scrape_workers
+    if _scrape_executor is None or _scrape_workers != workers:
+        _stop_scrape_executor()
+        _scrape_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scraper")
+        _scrape_workers = workers
+    return _scrape_executor
+
+
+def _fetch_on_worker(url, name, mode, pools):
+    """fetch_dashboard on a scrape worker, noting the worker's browser pool in pools[name]"""
+    if (mode or FETCH_MODE) != "api":
+        pools[name] = get_browser_pool()
+    return fetch_dashboard(url, name, mode)
+
+
+def scrape_concurrently(dashboards, concurrency=SCRAPE_CONCURRENCY, deadline=SCRAPE_DEADLINE_SECONDS, mode=None):
+    """
+    Load dashboards on a bounded worker pool and yield (name, payload) as each finishes.
+
+    A dashboard that fails is reported and skipped; one still running when the
+    deadline passes is left behind so it cannot hold up the others' readings,
+    and its worker's browser is killed so the hung call fails and frees the
+    worker (the browser is relaunched for its next dashboard).
+    """
+    executor = _get_scrape_executor(concurrency)
+    pools = {}
+    futures = {
+        executor.submit(_fetch_on_worker, url, name, mode, pools): name
+        for name, url in dashboards.items()
+    }
+
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            name = futures[future]
+            try:
+                yield name, future.result()
+            except Exception as e:
+                record_scrape_failure(name, e)
+                print(f"❌ {name}: scrape failed: {e}")
+    except FuturesTimeout:
+        for future, name in futures.items():
+            if future.done():
+                continue
+            scrape_timeouts_total.inc(dashboard=name, kind="deadline")
+            if future.cancel():
+                print(f"⏰ {name}: not started within {deadline}s, skipping this cycle")
+            elif name in pools:
+                pools[name].kill()
+                print(f"⏰ {name}: no result within {deadline}s, killed its browser, skipping this cycle")
+            else:
+                print(f"⏰ {name}: no result within {deadline}s, skipping this cycle")
+
+
+def shutdown_scrapers():
+    """Stop the scrape workers and close every browser they and this thread opened"""
+    _stop_scrape_executor()
+    close_all_browser_pools()
+    close_alerts()
+
+
+# -------- RECORD / REPLAY --------
+
+# Record mode archives every fetched payload (page text, or the results dict in
+# api/intercept mode) as gzipped JSON lines, one file per day
+RECORD_DIR = os.getenv("RECORD_DIR", "recordings")
+REPLAY_BATCH_ROWS = 500
+_recording = os.getenv("RECORD_PAGES", "0") == "1"
+
+
+def set_recording(enabled):
+    global _recording
+    _recording = enabled
+
+
+def record_payload(sensor_name, payload, mode=None):
+    """Append one fetched payload with its time and dashboard to today's archive"""
+    now = datetime.now()
+    entry = {
+        'timestamp_iso': now.strftime('%Y-%m-%dT%H:%M:%S'),
+        'epoch': time.time(),
+        'dashboard': sensor_name,
+        'mode': mode or FETCH_MODE,
+        'payload': payload,
+    }
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    path = os.path.join(RECORD_DIR, f"pages-{now.strftime('%Y-%m-%d')}.jsonl.gz")
+    # Each append adds a gzip member; gzip.open reads them back as one stream
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def iter_recordings(paths):
+    """Archived entries from files and/or directories of .jsonl(.gz) archives, in file order"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.jsonl*"))))
+        else:
+            files.append(path)
+
+    for path in files:
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Torn last line of an archive that was being written
+                        print(f"   ⚠️  Skipping unreadable entry in {path}")
+        except (OSError, EOFError) as e:
+            print(f"   ⚠️  Stopped reading {path}: {e}")
+
+
+def replay(paths, speed=0):
+    """
+    Feed recorded payloads through extraction, metric parsing and storage.
+
+    speed=0 replays as fast as possible; otherwise the recorded spacing is
+    kept, scaled down by speed (60 = an hour of recordings per minute).
+    Rows keep their recorded timestamps and fetch times, and only move the
+    latest snapshot forward.
+    """
+    storage = get_storage()
+    pace = f"at {speed:g}x" if speed else "as fast as possible"
+    print(f"\n⏯️  Replaying {', '.join(paths)} into {storage.describe()} {pace}")
+
+    start = time.time()
+    first_epoch = None
+    pages = rows = 0
+    for entry in iter_recordings(paths):
+        if speed:
+            if first_epoch is None:
+                first_epoch = entry['epoch']
+            delay = (entry['epoch'] - first_epoch) / speed - (time.time() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+        name, payload = entry['dashboard'], entry['payload']
+        # Per-page output would dominate the run time
+        with contextlib.redirect_stdout(io.StringIO()):
+            with extraction_seconds.time(dashboard=name):
+                results = payload if isinstance(payload, dict) else extract_parameters(payload)
+                metrics = build_metrics(results)
+            save_reading(name, metrics, timestamp=entry['timestamp_iso'], saved_at=entry['epoch'])
+        pages += 1
+
+        if speed or pages % REPLAY_BATCH_ROWS == 0:
+            rows += len(flush_readings())
+    rows += len(flush_readings())
+
+    elapsed = max(time.time() - start, 1e-9)
+    print(f"\n✅ Replayed {pages} page(s) into {rows} row(s) in {elapsed:.1f}s ({pages / elapsed:.0f} pages/s)")
+    write_scraper_metrics()
+    return pages, rows
+
+
 # -------- MAIN --------
 
-def run_single_check():
+def process_reading(sensor_name, payload):
+    digest = content_digest(payload)
+    if CHANGE_DETECTION and not content_changed(sensor_name, digest):
+        print(f"\n⏸️  {sensor_name}: dashboard unchanged since the last saved reading, skipping")
+        if UNCHANGED_HEARTBEAT:
+            record_heartbeat(sensor_name)
+        return
+
+    # The API backend already returns parsed results, page text still needs extraction
+    with extraction_seconds.time(dashboard=sensor_name):
+        results = payload if isinstance(payload, dict) else extract_parameters(payload)
+        metrics = build_metrics(results)
+    data_quality_total.inc(dashboard=sensor_name, quality=results.get('_data_quality', 'GOOD'))
+    display_terminal(sensor_name, results, metrics)
+    row = save_reading(sensor_name, metrics, content_hash=digest)
+    # Alerts go out once flush_readings() has stored the row
+    _pending_alerts[(row[1], row[0])] = metrics
+
+
+def run_single_check(concurrency=None, mode=None, dashboards=None):
+    """Scrape dashboards (default: all) once; returns the names that produced a reading"""
     print("\n" + "="*60)
     print("GRAFANA MONITOR")
     print("="*60)
 
-    for sensor_name, url in DASHBOARDS.items():
-        page_text = get_dashboard_data(url, sensor_name)
-        results = extract_parameters(page_text)
-        metrics = build_metrics(results)
-        display_terminal(sensor_name, results, metrics)
-        save_to_csv(sensor_name, metrics)
+    concurrency = concurrency or SCRAPE_CONCURRENCY
+    dashboards = DASHBOARDS if dashboards is None else dashboards
+    succeeded = set()
+
+    def fetch_all():
+        if concurrency <= 1:
+            for sensor_name, url in dashboards.items():
+                try:
+                    yield sensor_name, fetch_dashboard(url, sensor_name, mode)
+                except Exception as e:
+                    record_scrape_failure(sensor_name, e)
+                    print(f"❌ {sensor_name}: scrape failed: {e}")
+        else:
+            yield from scrape_concurrently(dashboards, concurrency, mode=mode)
+
+    try:
+        # Extraction, display and queuing stay on this thread, one sensor at a time
+        for sensor_name, payload in fetch_all():
+            if _recording:
+                try:
+                    record_payload(sensor_name, payload, mode)
+                except OSError as e:
+                    print(f"⚠️  {sensor_name}: could not record page: {e}")
+            try:
+                process_reading(sensor_name, payload)
+                succeeded.add(sensor_name)
+            except Exception as e:
+                print(f"❌ {sensor_name}: processing failed: {e}")
+    finally:
+        # One batched write per cycle, including readings taken before a failure
+        flush_readings()
+        if _alert_engine is not None:
+            _alert_engine.save()
+
+    print(f"\n🧭 Browser pool: {format_pool_stats()}")
+    if CHANGE_DETECTION:
+        print(f"🔍 Change detection: {format_change_stats()}")
+    if _alert_engine is not None:
+        print(f"🚨 Alerts: {_alert_engine.format_stats()}")
+    write_scraper_metrics()
+    return succeeded
 
 
-def run_watch_mode(interval, duration_minutes=None):
+def run_watch_mode(interval, duration_minutes=None, concurrency=None, mode=None, start_now=True):
     """
     Run scraping at specified interval indefinitely (24/7 mode).
     
+    Ticks are fixed-rate and wall-clock aligned (see scheduler.py): scrape
+    time doesn't stretch the period, failed dashboards are retried with
+    backoff, and slots missed by an overrunning scrape are skipped.
+    
     Args:
-        interval: Minutes between each scrape
+        interval: Minutes between each scrape (per-dashboard overrides in DASHBOARD_INTERVALS)
         duration_minutes: Optional - if set, stops after this duration (for testing)
+        concurrency: Optional - dashboards scraped at once (default: SCRAPE_CONCURRENCY)
+        mode: Optional - "browser", "intercept" or "api" fetch backend (default: FETCH_MODE)
+        start_now: Optional - scrape immediately instead of waiting for the first slot
+    
+    With FLEET_SHARDING on, the process joins the fleet and only runs the
+    due dashboards assigned to it; the rest are passed over. Otherwise, with
+    SCRAPER_LEASE on, it first stands by until it holds the scraper lease,
+    and goes back to standing by if the lease is lost.
     """
+    global _scraper_lease, _metrics_member
+    shard = None
+    owned = None
+    if FLEET_SHARDING:
+        shard = open_shard()
+        shard.join()
+        _metrics_member = shard.id
+        print(f"🧩 Joined the scraper fleet as {shard.id}")
+    elif SCRAPER_LEASE:
+        _scraper_lease = ScraperLease()
+        _scraper_lease.acquire()
+
     start_time = time.time()
     end_time = start_time + (duration_minutes * 60) if duration_minutes else None
     run_count = 0
+    scheduler = Scheduler(
+        {name: DASHBOARD_INTERVALS.get(name, interval) * 60 for name in DASHBOARDS},
+        start_now=start_now)
     
     print(f"\n🚀 Starting auto-scrape mode (24/7)")
-    print(f"   Interval: every {interval} minutes")
+    for name in list(DASHBOARDS)[:20]:
+        print(f"   {name}: {scheduler.describe(name)}")
+    if len(DASHBOARDS) > 20:
+        print(f"   ... and {len(DASHBOARDS) - 20} more dashboard(s)")
     if duration_minutes:
         stop_at = datetime.now() + timedelta(minutes=duration_minutes)
         print(f"   TEST MODE: Will stop at {stop_at.strftime('%H:%M:%S')}")
     else:
         print(f"   Running indefinitely until process restarts")
     
-    while True:
-        if end_time and time.time() >= end_time:
-            print(f"\n✅ Test duration completed ({run_count} scrape(s)).")
-            break
+    try:
+        while True:
+            if _scraper_lease is not None and not _scraper_lease.held():
+                print(f"\n⏳ Scraper lease lost, standing by")
+                _scraper_lease.acquire()
+                continue
+
+            wake_at = scheduler.next_wakeup()
+            if end_time and min(time.time(), wake_at) >= end_time:
+                print(f"\n✅ Test duration completed ({run_count} scrape(s)).")
+                print(f"   Browser pool: {format_pool_stats()}")
+                print(f"   Scheduler: {scheduler.format_stats()}")
+                shutdown_scrapers()
+                break
+
+            wait = wake_at - time.time()
+            if wait > 0:
+                if end_time:
+                    wait = min(wait, end_time - time.time())
+                if wait >= 1:
+                    print(f"\n💤 Sleeping {wait:.0f}s until {datetime.fromtimestamp(time.time() + wait).strftime('%H:%M:%S')}...")
+                time.sleep(max(0, wait))
+                continue
+
+            due = scheduler.due()
+            if shard is not None:
+                mine = set(shard.assigned(DASHBOARDS))
+                if mine != owned:
+                    gained = len(mine - owned) if owned is not None else len(mine)
+                    lost = len(owned - mine) if owned is not None else 0
+                    print(f"\n🧩 {shard.id} owns {len(mine)}/{len(DASHBOARDS)} dashboard(s) "
+                          f"(+{gained} -{lost}, {len(shard.members())} member(s))")
+                    owned = mine
+                for name in due:
+                    if name not in mine:
+                        scheduler.skip(name)
+                due = [name for name in due if name in mine]
+                if not due:
+                    continue
+
+            run_count += 1
+            print(f"\n⏱️  Run #{run_count} | Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | {', '.join(due)}")
             
-        run_count += 1
-        print(f"\n⏱️  Run #{run_count} | Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        try:
-            run_single_check()
-        except Exception as e:
-            print(f"❌ Error during scrape: {e}")
-            print("   Will retry at next interval...")
-        
-        print(f"\n💤 Sleeping for {interval} minutes...")
-        time.sleep(interval * 60)
+            try:
+                succeeded = run_single_check(concurrency, mode, {name: DASHBOARDS[name] for name in due})
+            except Exception as e:
+                print(f"❌ Error during scrape: {e}")
+                succeeded = set()
+
+            for name in due:
+                scheduler.record(name, name in succeeded)
+                if name not in succeeded:
+                    print(f"   🔁 {name}: retrying, {scheduler.describe(name)}")
+            print(f"🗓️  Scheduler: {scheduler.format_stats()}")
+    finally:
+        if _scraper_lease is not None:
+            _scraper_lease.release()
+        if shard is not None:
+            shard.leave()
+            try:
+                os.remove(shard_textfile(shard.id))
+            except OSError:
+                pass
+            _metrics_member = None
 
 
 if __name__ == "__main__":
@@ -499,14 +1402,25 @@ if __name__ == "__main__":
         parser.add_argument("--watch", "-w", action="store_true", help="Run in watch mode (auto-scrape 24/7)")
         parser.add_argument("--interval", "-i", type=int, default=POLL_INTERVAL_MINUTES, help="Minutes between scrapes (default: 10)")
         parser.add_argument("--duration", "-d", type=int, default=None, help="Optional: Total duration in minutes (for testing only)")
+        parser.add_argument("--concurrency", "-c", type=int, default=SCRAPE_CONCURRENCY, help=f"Dashboards scraped at once (default: {SCRAPE_CONCURRENCY}, 1 = sequential)")
+        parser.add_argument("--fetch-mode", "-m", choices=["browser", "intercept", "api"], default=FETCH_MODE, help=f"Fetch backend (default: {FETCH_MODE})")
+        parser.add_argument("--record", action="store_true", help=f"Archive every fetched page to {RECORD_DIR}/")
+        parser.add_argument("--replay", nargs="+", metavar="PATH", help="Replay archived pages (files or directories) into storage, no browser needed")
+        parser.add_argument("--speed", type=float, default=0, help="Replay time scale, e.g. 60 = an hour per minute (default: 0, as fast as possible)")
         args = parser.parse_args()
         
-        print(f"Arguments parsed: watch={args.watch}, interval={args.interval}, duration={args.duration}")
+        print(f"Arguments parsed: watch={args.watch}, interval={args.interval}, duration={args.duration}, concurrency={args.concurrency}, fetch_mode={args.fetch_mode}")
+
+        if args.record:
+            set_recording(True)
 
-        if args.watch:
-            run_watch_mode(args.interval, args.duration)
+        if args.replay:
+            replay(args.replay, args.speed)
+        elif args.watch:
+            run_watch_mode(args.interval, args.duration, args.concurrency, args.fetch_mode)
         else:
-            run_single_check()
+            run_single_check(args.concurrency, args.fetch_mode)
+            shutdown_scrapers()
     except Exception as e:
         print(f"FATAL ERROR: {e}")
         import traceback
@@ -0,0 +1,119 @@
+"""
+Fixed-rate, wall-clock-aligned scheduling for the scrape loop.
+
+Each job (one per dashboard) runs on slots at multiples of its interval since
+the epoch, shifted by a stable per-job offset so dashboards sharing an
+interval don't all fire at once. The period is the interval no matter how
+long a scrape takes:
+
+- a failure is retried quickly with exponential backoff (never later than
+  the job's next regular slot), and the backoff resets on success
+- a run that overruns one or more slots doesn't make them pile up: missed
+  slots are counted and the job continues at the next slot after now
+"""
+
+import os
+import time
+import zlib
+
+SCHEDULE_JITTER_SECONDS = float(os.getenv("SCHEDULE_JITTER_SECONDS", "30"))
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "30"))
+
+
+class Job:
+    def __init__(self, name, interval, offset):
+        self.name = name
+        self.interval = interval
+        self.offset = offset
+        self.next_due = None
+        self.slot = None
+        self.failures = 0
+        self.runs = 0
+        self.errors = 0
+        self.skipped = 0
+
+    def slot_after(self, now):
+        """First aligned slot strictly after now"""
+        k = (now - self.offset) // self.interval + 1
+        return k * self.interval + self.offset
+
+
+class Scheduler:
+    def __init__(self, intervals, jitter=SCHEDULE_JITTER_SECONDS, retry_base=RETRY_BASE_SECONDS,
+                 start_now=True, clock=time.time):
+        """
+        intervals: {job name: seconds between runs}
+        start_now: first run of every job is due immediately instead of at its first slot
+        """
+        self.clock = clock
+        self.retry_base = retry_base
+        self.jobs = {}
+        now = clock()
+        for name, interval in intervals.items():
+            # Stable per-job offset in [0, jitter), never more than a quarter interval
+            spread = min(jitter, interval / 4.0)
+            offset = (zlib.crc32(name.encode()) % 1000) / 1000.0 * spread
+            job = Job(name, float(interval), offset)
+            job.slot = job.slot_after(now)
+            if start_now:
+                # The immediate run stands in for the slot already under way
+                job.slot -= job.interval
+                job.next_due = now
+            else:
+                job.next_due = job.slot
+            self.jobs[name] = job
+
+    def next_wakeup(self):
+        return min(job.next_due for job in self.jobs.values())
+
+    def due(self):
+        """Names of jobs whose time has come"""
+        now = self.clock()
+        return [name for name, job in self.jobs.items() if job.next_due <= now]
+
+    def record(self, name, ok):
+        """Report how a job's run went and schedule its next one"""
+        job = self.jobs[name]
+        now = self.clock()
+        job.runs += 1
+
+        # Regular slots that went by during the run (or while retrying) are dropped
+        next_slot = job.slot_after(now)
+        missed = int((next_slot - job.slot) // job.interval) - 1
+        if missed > 0:
+            job.skipped += missed
+        job.slot = next_slot
+
+        if ok:
+            job.failures = 0
+            job.next_due = next_slot
+            return
+
+        job.errors += 1
+        job.failures += 1
+        backoff = self.retry_base * (2 ** (job.failures - 1))
+        job.next_due = min(now + backoff, next_slot)
+
+    def skip(self, name):
+        """Pass over a due run without counting it (e.g. the job moved to another shard)"""
+        job = self.jobs[name]
+        job.slot = job.slot_after(self.clock())
+        job.next_due = job.slot
+        job.failures = 0
+
+    def stats(self):
+        totals = {'runs': 0, 'errors': 0, 'skipped': 0}
+        for job in self.jobs.values():
+            totals['runs'] += job.runs
+            totals['errors'] += job.errors
+            totals['skipped'] += job.skipped
+        return totals
+
+    def format_stats(self):
+        s = self.stats()
+        return f"{s['runs']} run(s), {s['errors']} failure(s), {s['skipped']} skipped overrun slot(s)"
+
+    def describe(self, name):
+        job = self.jobs[name]
+        when = time.strftime('%H:%M:%S', time.localtime(job.next_due))
+        return f"every {job.interval / 60:g} min (+{job.offset:.0f}s), next at {when}"
@@ -1,71 +1,114 @@
-from flask import Flask, jsonify, send_from_directory
-import csv
-from datetime import datetime
+from flask import Flask, Response, g, jsonify, request, send_from_directory, stream_with_context
+from werkzeug.http import is_resource_modified
+from datetime import datetime, timedelta, timezone
+import base64
+import gzip
+import hashlib
+import json
 import os
+import queue
+import re
 import threading
 import time
 
+from history_cache import COLUMNS, NUMERIC_COLUMNS, reading_to_dict
+from storage import open_storage, CSV_FILE
+from downsample import lttb, LRUCache, BucketAggregates, pick_bucket_width, iso_to_epoch
+from lease import read_lease, LEASE_TTL_SECONDS
+from metric_stats import MetricStats, parse_windows, STATS_WINDOWS, ANOMALY_Z, ANOMALY_MIN_SAMPLES
+from metrics import Registry, read_textfiles, shard_textfiles, METRICS_TEXTFILE
+from fleet import live_members
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 app = Flask(__name__, static_folder='.')
 
-CSV_FILE = "readings_history.csv"
-
-def ensure_csv_initialized():
-    """Ensure CSV file exists with headers"""
-    if not os.path.exists(CSV_FILE):
-        print(f"   [*] Initializing {CSV_FILE}...")
-        with open(CSV_FILE, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                'timestamp_iso', 'sensor', 'temperature_c', 'moisture_pct',
-                'ec_us_cm', 'ph', 'nitrogen', 'phosphorus', 'potassium',
-                'temperature_status', 'moisture_status',
-                'ec_status', 'ph_status', 'overall_status'
-            ])
-        print(f"   [OK] CSV initialized with headers")
-    else:
-        # Check if CSV has headers (more than 0 lines)
-        with open(CSV_FILE, 'r', newline='') as f:
-            line_count = sum(1 for line in f)
-        if line_count == 0:
-            print(f"   [*] CSV file empty, adding headers...")
-            with open(CSV_FILE, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    'timestamp_iso', 'sensor', 'temperature_c', 'moisture_pct',
-                    'ec_us_cm', 'ph', 'nitrogen', 'phosphorus', 'potassium',
-                    'temperature_status', 'moisture_status',
-                    'ec_status', 'ph_status', 'overall_status'
-                ])
-            print(f"   [OK] Headers added to CSV")
+LATEST_FILE = "last_readings.json"
+
+# A sensor counts as disconnected when its newest reading is older than this
+STALE_AFTER_SECONDS = int(os.getenv("STALE_AFTER_SECONDS", str(3 * 10 * 60)))
+
+# SERVE_ONLY=1: never start the embedded scraper; a separate worker scrapes.
+# Otherwise the embedded scraper still only runs while it holds the scraper lease
+SERVE_ONLY = os.getenv("SERVE_ONLY", "0") == "1"
+
+# Readings storage (STORAGE_BACKEND=csv|sqlite), shared interface for all queries
+history = open_storage()
+
+
+def ensure_storage_initialized():
+    """Ensure the storage backend exists (CSV with headers, SQLite schema)"""
+    history.initialize()
 
 def read_csv_data():
-    """Read all data from CSV file"""
-    ensure_csv_initialized()
-    data = []
+    """Read all readings from storage as string dicts"""
+    ensure_storage_initialized()
     try:
-        if os.path.exists(CSV_FILE):
-            with open(CSV_FILE, 'r', newline='') as f:
-                reader = csv.DictReader(f)
-                if reader is not None:
-                    for row in reader:
-                        if row:  # Skip empty rows
-                            # Ensure NPK fields exist (for backward compatibility)
-                            row.setdefault('nitrogen', 'NA')
-                            row.setdefault('phosphorus', 'NA')
-                            row.setdefault('potassium', 'NA')
-                            data.append(row)
+        return [reading_to_dict(row) for row in history.rows()]
     except Exception as e:
-        print(f"   [!] Error reading CSV: {e}")
-    return data
+        print(f"   [!] Error reading {history.describe()}: {e}")
+        return []
+
+_latest_snapshot = {'mtime': None, 'data': {}}
+_latest_lock = threading.Lock()
+
+
+def _read_latest_snapshot():
+    """Scraper-maintained latest-reading index, re-read only when the file changes"""
+    try:
+        mtime = os.path.getmtime(LATEST_FILE)
+    except OSError:
+        return None
+
+    with _latest_lock:
+        if mtime != _latest_snapshot['mtime']:
+            try:
+                with open(LATEST_FILE, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return None
+            # Older scraper versions wrote a different layout here; ignore it
+            if not isinstance(data, dict) or not all(
+                    isinstance(v, dict) and 'timestamp_iso' in v for v in data.values()):
+                data = {}
+            _latest_snapshot['mtime'] = mtime
+            _latest_snapshot['data'] = data
+        return _latest_snapshot['data']
+
+
+def _latest_from_history():
+    return {sensor: reading_to_dict(row) for sensor, row in history.latest().items()}
+
+
+def _reading_age(reading):
+    """Seconds since the reading was saved, falling back to its timestamp"""
+    saved_at = reading.get('saved_at')
+    if saved_at is None:
+        try:
+            saved_at = datetime.strptime(reading.get('timestamp_iso', ''), '%Y-%m-%dT%H:%M:%S').timestamp()
+        except ValueError:
+            return None
+    return max(0.0, time.time() - float(saved_at))
+
 
 def get_latest_readings():
-    """Get the most recent reading for each sensor"""
-    data = read_csv_data()
+    """Get the most recent reading for each sensor, with server-side staleness"""
+    snapshot = _read_latest_snapshot()
+    if not snapshot:
+        ensure_storage_initialized()
+        snapshot = _latest_from_history()
+
     latest = {}
-    
-    for row in data:
-        sensor = row.get('sensor', 'Unknown')
-        latest[sensor] = row
+    for sensor, reading in snapshot.items():
+        reading = dict(reading)
+        reading.pop('content_hash', None)
+        age = _reading_age(reading)
+        reading['age_seconds'] = round(age) if age is not None else None
+        reading['connected'] = age is not None and age <= STALE_AFTER_SECONDS
+        latest[sensor] = reading
     
     return latest
 
@@ -80,19 +123,500 @@ def api_latest():
     print(f"[API] /api/latest called, returning {len(latest)} sensors")
     return jsonify(latest)
 
+# ===== HISTORY QUERIES =====
+
+RELATIVE_TIME_RE = re.compile(r'^(\d+)([mhdw])$')
+RELATIVE_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+class QueryError(ValueError):
+    pass
+
+
+def parse_time_param(value):
+    """'24h' / '7d' style offsets or ISO datetimes -> ISO string as stored in the CSV"""
+    if not value or value == 'all':
+        return None
+    m = RELATIVE_TIME_RE.match(value)
+    if m:
+        when = datetime.now() - timedelta(**{RELATIVE_UNITS[m.group(2)]: int(m.group(1))})
+    else:
+        try:
+            when = datetime.fromisoformat(value)
+        except ValueError:
+            raise QueryError(f"Invalid time '{value}', use e.g. 24h, 7d or 2026-02-09T14:00:00")
+    return when.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def parse_fields_param(value):
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in COLUMNS]
+    if unknown:
+        raise QueryError(f"Unknown field(s): {', '.join(unknown)}")
+    # Rows are meaningless without their timestamp and sensor
+    return ['timestamp_iso', 'sensor'] + [f for f in fields if f not in ('timestamp_iso', 'sensor')]
+
+
+def _history_params(sensor=None):
+    since = parse_time_param(request.args.get('since'))
+    until = parse_time_param(request.args.get('until'))
+    fields = parse_fields_param(request.args.get('fields'))
+    sensor = sensor or request.args.get('sensor') or None
+    if sensor == 'all':
+        sensor = None
+    return since, until, sensor, fields
+
+
+def _rows_to_dicts(rows, fields):
+    data = [reading_to_dict(row) for row in rows]
+    if fields:
+        data = [{f: row[f] for f in fields} for row in data]
+    return data
+
+
+def query_history(sensor=None):
+    """Run a history query from the request's since/until/sensor/fields parameters"""
+    since, until, sensor, fields = _history_params(sensor)
+    return _rows_to_dicts(history.query(since, until, sensor), fields)
+
+
+def encode_cursor(generation, seq):
+    return base64.urlsafe_b64encode(f"{generation}:{seq}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Opaque cursor -> (generation, row sequence)"""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        generation, seq = (int(x) for x in raw.split(':'))
+    except ValueError:
+        raise QueryError(f"Invalid cursor '{value}'")
+    return generation, seq
+
+
+def query_history_delta(sensor=None):
+    """
+    History with a cursor: an empty cursor (or one from an older generation)
+    gets the full query result with reset=true; a current one gets only the
+    rows stored after it. Either way 'cursor' is what to send next time.
+
+    The cursor is taken before reading, so a row stored meanwhile may be
+    delivered twice; clients de-duplicate on (sensor, timestamp_iso).
+    """
+    since, until, sensor, fields = _history_params(sensor)
+    cursor = request.args.get('cursor')
+    generation, count = history.version()
+
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None and position[0] == generation and position[1] <= count:
+        seq = position[1]
+        _, appended = history.rows_since(seq)
+        count = seq + len(appended)
+        rows = sorted(
+            (r for r in appended
+             if (sensor is None or r.sensor == sensor)
+             and (not since or r.timestamp_iso >= since)
+             and (not until or r.timestamp_iso <= until)),
+            key=lambda r: r.timestamp_iso)
+        reset = False
+    else:
+        rows = history.query(since, until, sensor)
+        reset = True
+
+    return {
+        'rows': _rows_to_dicts(rows, fields),
+        'cursor': encode_cursor(generation, count),
+        'reset': reset,
+    }
+
+
+@app.errorhandler(QueryError)
+def handle_query_error(e):
+    return jsonify({'error': str(e)}), 400
+
+# ===== CONDITIONAL RESPONSES =====
+
+# Bodies smaller than this go out uncompressed
+COMPRESS_MIN_BYTES = 1024
+
+# Serialized (and compressed) bodies keyed on (validator, encoding)
+BODY_CACHE_MAX_BYTES = int(os.getenv("BODY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+body_cache = LRUCache(64, max_weight=BODY_CACHE_MAX_BYTES, weigh=lambda entry: len(entry[0]))
+
+
+def data_etag(sensor=None):
+    """
+    Validator for the current request: the data version, the rows its time
+    range selects (since=24h resolves differently every second but usually
+    selects the same rows) and every other query parameter
+    """
+    since = parse_time_param(request.args.get('since'))
+    until = parse_time_param(request.args.get('until'))
+    sensor = sensor or request.args.get('sensor') or None
+    if sensor == 'all':
+        sensor = None
+    params = sorted((k, v) for k, v in request.args.items(multi=True) if k not in ('since', 'until'))
+    key = repr((history.version(), history.span(since, until, sensor), request.path, params))
+    return hashlib.sha1(key.encode()).hexdigest()[:24]
+
+
+# Data version last seen, and when it was first seen
+_data_changed = {'version': None, 'at': None}
+_data_changed_lock = threading.Lock()
+
+
+def _last_modified():
+    """
+    When the current data version was first seen, as an aware UTC datetime.
+    Unlike the newest reading's timestamp this also moves forward on a
+    truncation, rotation or backfill of older rows, so a client sending only
+    If-Modified-Since never gets a 304 for changed data. (Werkzeug already
+    ignores If-Modified-Since when If-None-Match is sent.)
+    """
+    version = history.version()
+    with _data_changed_lock:
+        if version != _data_changed['version']:
+            now = datetime.now(timezone.utc).replace(microsecond=0)
+            previous = _data_changed['at']
+            # HTTP dates have one-second resolution: never repeat one for new data
+            if previous is not None and now <= previous:
+                now = previous + timedelta(seconds=1)
+            _data_changed['version'] = version
+            _data_changed['at'] = now
+        return _data_changed['at']
+
+
+def _preferred_encoding():
+    accepted = request.headers.get('Accept-Encoding', '')
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def _encode_body(data, encoding):
+    body = app.json.dumps(data, separators=(',', ':')).encode('utf-8')
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == 'br':
+        return brotli.compress(body), encoding
+    return gzip.compress(body, compresslevel=6), encoding
+
+
+def conditional_json(build, sensor=None):
+    """
+    JSON response for build() with ETag and Last-Modified. A matching
+    If-None-Match (or If-Modified-Since) gets a 304 without calling build();
+    otherwise the encoded body is reused for as long as the data is unchanged.
+    """
+    etag = data_etag(sensor)
+    last_modified = _last_modified()
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = app.response_class(status=304)
+    else:
+        encoding = _preferred_encoding()
+        body, encoding = body_cache.get_or_compute(
+            (etag, encoding), lambda: _encode_body(build(), encoding))
+        response = app.response_class(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Let browsers keep the body but always revalidate it
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/api/history')
 def api_history():
-    """Get all historical readings"""
-    data = read_csv_data()
-    print(f"[API] /api/history called, returning {len(data)} rows")
-    return jsonify(data)
+    """
+    Get historical readings, optionally filtered by since/until/sensor/fields.
+    With a cursor parameter the reply is {rows, cursor, reset} (see query_history_delta).
+    """
+    ensure_storage_initialized()
+
+    def build():
+        if 'cursor' in request.args:
+            data = query_history_delta()
+            print(f"[API] /api/history called, returning {len(data['rows'])} rows (reset={data['reset']})")
+            return data
+        data = query_history()
+        print(f"[API] /api/history called, returning {len(data)} rows")
+        return data
+    return conditional_json(build)
 
 @app.route('/api/history/<sensor>')
 def api_sensor_history(sensor):
-    """Get history for a specific sensor"""
-    data = read_csv_data()
-    filtered = [row for row in data if row.get('sensor') == sensor]
-    return jsonify(filtered)
+    """Get history for a specific sensor, optionally filtered by since/until/fields/cursor"""
+    ensure_storage_initialized()
+    if 'cursor' in request.args:
+        return conditional_json(lambda: query_history_delta(sensor), sensor)
+    return conditional_json(lambda: query_history(sensor), sensor)
+
+# ===== DOWNSAMPLED SERIES =====
+
+SERIES_METHODS = ('lttb', 'minmax')
+DEFAULT_SERIES_POINTS = 500
+MAX_SERIES_POINTS = 5000
+
+lttb_cache = LRUCache()
+bucket_aggregates = BucketAggregates()
+
+
+def parse_points_param(value):
+    if not value:
+        return DEFAULT_SERIES_POINTS
+    try:
+        points = int(value)
+    except ValueError:
+        raise QueryError(f"Invalid points '{value}', expected an integer")
+    return max(3, min(points, MAX_SERIES_POINTS))
+
+
+def _lttb_series(sensor, fields, since, until, points):
+    """LTTB-downsampled {field: {"t", "y"}} for one sensor, cached per data version"""
+    def compute():
+        rows, epochs = history.query(since, until, sensor, with_epochs=True)
+        per_field = {}
+        for field in fields:
+            samples = [(e, getattr(r, field), r.timestamp_iso) for r, e in zip(rows, epochs)
+                       if e is not None and getattr(r, field) is not None]
+            picked = lttb(samples, points)
+            per_field[field] = {'t': [p[2] for p in picked], 'y': [p[1] for p in picked]}
+        return per_field
+
+    key = (history.version(), history.span(since, until, sensor), sensor, tuple(fields), points)
+    return lttb_cache.get_or_compute(key, compute)
+
+
+def _epoch_bounds():
+    if hasattr(history, 'aggregate'):
+        return history.epoch_bounds()
+    return bucket_aggregates.epoch_bounds(history)
+
+
+def _bucket_series(sensor, field, width, start, end):
+    """Bucketed min/avg/max: the columnar backend aggregates its arrays, others fold rows"""
+    if hasattr(history, 'aggregate'):
+        return history.aggregate(sensor, field, width, start, end)
+    return bucket_aggregates.series(history, sensor, field, width, start, end)
+
+
+def query_series():
+    """Downsampled series per sensor and metric from since/until/sensor/fields/points/method"""
+    since = parse_time_param(request.args.get('since'))
+    until = parse_time_param(request.args.get('until'))
+    points = parse_points_param(request.args.get('points'))
+    method = request.args.get('method', 'lttb')
+    if method not in SERIES_METHODS:
+        raise QueryError(f"Unknown method '{method}', use one of: {', '.join(SERIES_METHODS)}")
+
+    fields = parse_fields_param(request.args.get('fields'))
+    fields = [f for f in (fields or COLUMNS) if f in NUMERIC_COLUMNS]
+    sensor = request.args.get('sensor') or None
+    if sensor == 'all':
+        sensor = None
+    sensors = history.sensors() if sensor is None else [sensor]
+
+    # Rows the range holds (the dashboard's record count, without fetching them)
+    result = {'method': method, 'points': points, 'count': history.count(since, until, sensor),
+              'series': {}}
+    if method == 'minmax':
+        # From parsed epochs: a malformed timestamp may sort first or last
+        first, last = _epoch_bounds()
+        if first is None:
+            return result
+        start = iso_to_epoch(since) if since else first
+        end = iso_to_epoch(until) if until else last
+        width = pick_bucket_width(max(end - start, 0), points)
+        result['bucket_seconds'] = width
+
+    for name in sensors:
+        if method == 'minmax':
+            result['series'][name] = {
+                field: _bucket_series(name, field, width, start, end)
+                for field in fields
+            }
+        else:
+            result['series'][name] = _lttb_series(name, fields, since, until, points)
+    return result
+
+@app.route('/api/series')
+def api_series():
+    """Chart series downsampled to a point budget (method=lttb or minmax)"""
+    ensure_storage_initialized()
+    return conditional_json(query_series)
+
+# ===== ROLLING STATS =====
+
+metric_stats = MetricStats()
+
+
+def query_stats():
+    """Online stats per sensor and metric, plus recently flagged anomalies"""
+    fields = parse_fields_param(request.args.get('fields'))
+    fields = [f for f in fields if f in NUMERIC_COLUMNS] if fields else None
+    sensor = request.args.get('sensor') or None
+    if sensor == 'all':
+        sensor = None
+    return {
+        'windows': [label for label, _ in parse_windows(STATS_WINDOWS)],
+        'anomaly_z': ANOMALY_Z,
+        'anomaly_min_samples': ANOMALY_MIN_SAMPLES,
+        'stats': metric_stats.snapshot(history, sensor, fields),
+        'anomalies': metric_stats.recent_anomalies(sensor),
+    }
+
+@app.route('/api/stats')
+def api_stats():
+    """Welford/EWMA stats, rolling min/max and anomaly flags (sensor, fields optional)"""
+    ensure_storage_initialized()
+    return conditional_json(query_stats)
+
+# ===== LIVE STREAM =====
+
+# Known limitation: the fan-out is shared, but every open stream still holds
+# one server thread for as long as it stays connected (Flask's threaded server
+# under `python server.py` starts a thread per connection; gunicorn's gthread
+# worker has a fixed --threads pool, see Procfile). STREAM_MAX_CLIENTS caps
+# the streams so the API keeps threads to answer with; keep it well below the
+# thread count. Clients over the cap get a 503 and the dashboard falls back
+# to polling; 0 turns streaming off.
+STREAM_MAX_CLIENTS = int(os.getenv("STREAM_MAX_CLIENTS", "8"))
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "2"))
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_QUEUE_SIZE = 256
+# A reconnecting client missing more rows than this reloads instead
+STREAM_MAX_BACKLOG = 1000
+
+
+def _event(name, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+class ReadingBroadcaster:
+    """
+    One watcher thread polls storage for new rows and fans each out to a
+    bounded queue per subscriber. The thread runs only while someone is
+    subscribed; a client too slow to drain its queue is dropped (it will
+    reconnect and resume from its Last-Event-ID).
+    """
+
+    def __init__(self, storage, max_clients=STREAM_MAX_CLIENTS):
+        self.storage = storage
+        self.max_clients = max_clients
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self):
+        """New client queue, or None when the client cap is reached"""
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                return None
+            q = queue.Queue(STREAM_QUEUE_SIZE)
+            self._clients.add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name="stream-watcher", daemon=True)
+                self._thread.start()
+            return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._clients.discard(q)
+
+    def is_subscribed(self, q):
+        with self._lock:
+            return q in self._clients
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def _broadcast(self, item):
+        with self._lock:
+            for q in list(self._clients):
+                try:
+                    q.put_nowait(item)
+                except queue.Full:
+                    self._clients.discard(q)
+
+    def _watch(self):
+        generation, seq = self.storage.version()
+        while True:
+            time.sleep(STREAM_POLL_SECONDS)
+            with self._lock:
+                if not self._clients:
+                    self._thread = None
+                    return
+            try:
+                current, count = self.storage.version()
+                if current != generation:
+                    generation, seq = current, count
+                    self._broadcast(('reset', {'generation': current}, None))
+                elif count > seq:
+                    _, rows = self.storage.rows_since(seq)
+                    for row in rows:
+                        seq += 1
+                        self._broadcast(('reading', reading_to_dict(row), f"{generation}-{seq}"))
+            except Exception as e:
+                print(f"   [!] Stream watcher error: {e}")
+
+
+broadcaster = ReadingBroadcaster(history)
+
+
+def _stream_backlog(last_event_id):
+    """Events a reconnecting client missed since last_event_id ("generation-seq")"""
+    try:
+        generation, seq = (int(x) for x in last_event_id.split('-'))
+    except (AttributeError, ValueError):
+        return []
+    current, count = history.version()
+    if generation != current or count - seq > STREAM_MAX_BACKLOG:
+        return [_event('reset', {'generation': current})]
+    _, rows = history.rows_since(seq)
+    return [_event('reading', reading_to_dict(row), f"{current}-{seq + i + 1}")
+            for i, row in enumerate(rows)]
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events: one 'reading' event per newly stored row"""
+    q = broadcaster.subscribe()
+    if q is None:
+        return jsonify({'error': 'Too many live stream clients, poll /api/history instead'}), 503
+    backlog = _stream_backlog(request.headers.get('Last-Event-ID'))
+    print(f"[API] /api/stream client connected ({broadcaster.client_count()}/{broadcaster.max_clients})")
+
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            for event in backlog:
+                yield event
+            while True:
+                try:
+                    name, data, event_id = q.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    # Dropped for falling behind: end the response, the browser reconnects
+                    if not broadcaster.is_subscribed(q):
+                        return
+                    # Comment line keeps proxies from timing out and detects gone clients
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _event(name, data, event_id)
+        finally:
+            broadcaster.unsubscribe(q)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/api/debug')
 def api_debug():
@@ -102,6 +626,10 @@ def api_debug():
         csv_data = read_csv_data()
         return jsonify({
             'status': 'OK',
+            'storage_backend': history.name,
+            'storage': history.describe(),
+            'serve_only': SERVE_ONLY,
+            'scraper': scraper_status(),
             'csv_file_exists': os.path.exists(CSV_FILE),
             'csv_rows': len(csv_data),
             'sensors_in_api': list(latest.keys()),
@@ -116,29 +644,93 @@ def api_debug():
         }), 500
 
 
+# ===== METRICS =====
+
+API_METRICS = Registry()
+api_request_seconds = API_METRICS.histogram(
+    "api_request_seconds", "Time to build a response, by route", ("route", "method"))
+api_requests_total = API_METRICS.counter(
+    "api_requests_total", "Responses sent, by route and status", ("route", "status"))
+api_last_request_seconds = API_METRICS.gauge(
+    "api_last_request_seconds", "Latency of the most recent request, by route", ("route",))
+
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = _route_label()
+        elapsed = time.perf_counter() - started
+        api_request_seconds.observe(elapsed, route=route, method=request.method)
+        api_last_request_seconds.set(elapsed, route=route)
+        api_requests_total.inc(route=route, status=response.status_code)
+    return response
+
+
+def _scraper_textfiles():
+    """
+    The scraper's textfile plus one per fleet shard: static shard-N files
+    always, dynamic members' only while their heartbeat is live
+    """
+    live = None
+    paths = [METRICS_TEXTFILE]
+    for member, path in sorted(shard_textfiles().items()):
+        if not member.startswith("shard-"):
+            if live is None:
+                live = live_members()
+            if member not in live:
+                continue
+        paths.append(path)
+    return paths
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text format: API metrics plus the scrapers' textfiles (see metrics.py)"""
+    body = API_METRICS.render() + read_textfiles(_scraper_textfiles())
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
 # ===== BACKGROUND SCRAPER =====
+def scraper_status():
+    """Who holds the scraper lease and whether its heartbeat is current"""
+    lease = read_lease()
+    if not lease:
+        return {'leader': None, 'alive': False}
+    # A released lease has its heartbeat zeroed
+    heartbeat_at = lease.get('heartbeat_at') or None
+    age = time.time() - heartbeat_at if heartbeat_at else None
+    return {
+        'leader': lease.get('owner'),
+        'token': lease.get('token'),
+        'heartbeat_age_seconds': round(age) if age is not None else None,
+        'alive': age is not None and age <= LEASE_TTL_SECONDS,
+    }
+
+
 def start_background_scraper():
     """Run scraper in background thread"""
     import sys
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from monitor import run_watch_mode, run_single_check
+    from monitor import run_watch_mode
     
     print("\n" + "="*60)
     print("STARTING BACKGROUND SCRAPER")
     print("="*60)
-    
-    # Run immediate first check to populate CSV
-    print("   [*] Running initial scrape...")
-    try:
-        run_single_check()
-        print("   [OK] Initial scrape complete")
-    except Exception as e:
-        print(f"   [!] Initial scrape failed: {e}")
-    
-    print("   Scraper will continue every 10 minutes")
+    print("   [*] Waiting for the scraper lease, then scraping every 10 minutes")
     print("="*60 + "\n")
     
     try:
+        # Scrapes immediately once this process holds the lease
         run_watch_mode(interval=10, duration_minutes=None)
     except Exception as e:
         print(f"ERROR: Scraper error: {e}")
@@ -161,17 +753,21 @@ if __name__ == '__main__':
     print("SENSOR DASHBOARD SERVER STARTING")
     print("="*50)
     print(f"   Port: 0.0.0.0:{port}")
+    print(f"   Live stream clients: up to {STREAM_MAX_CLIENTS} (STREAM_MAX_CLIENTS)")
     print("="*50)
     
-    # Ensure CSV is initialized first
-    ensure_csv_initialized()
+    # Ensure storage is initialized first
+    ensure_storage_initialized()
     
-    # Load and verify data from CSV
+    # Load and verify data from storage
     initial_data = read_csv_data()
     print(f"   [OK] Loaded {len(initial_data)} historical data rows")
     
-    # Start background scraper thread
-    init_scraper()
+    # Start background scraper thread unless a separate worker does the scraping
+    if SERVE_ONLY:
+        print("   [*] Serve-only mode: scraping is left to the worker process")
+    else:
+        init_scraper()
     
     try:
         app.run(debug=False, host='0.0.0.0', port=port, threaded=True)
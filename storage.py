@@ -0,0 +1,1034 @@
+"""
+Pluggable storage for sensor readings.
+
+The scraper queues one row per sensor with add() and writes the whole cycle
+with flush(); the server reads through the same objects, which share the
+HistoryCache read interface (rows, query, rows_since, span, sensors, bounds,
+version) plus latest().
+
+Backends, picked with STORAGE_BACKEND:
+
+    csv          readings_history.csv (default)
+    sqlite       readings.db in WAL mode, indexed on (sensor, timestamp_iso)
+    columnar     readings_columns/, fixed-width binary columns read through mmap
+    partitioned  readings_partitions/, one CSV per day or month plus a manifest
+
+File-based backends append each flush in a single write and fsync per
+STORAGE_FSYNC: "batch" after every flush (default), "interval" at most every
+STORAGE_FSYNC_SECONDS, "off" to leave it to the OS.
+
+Move existing history into SQLite (or --backend columnar / partitioned) once with:
+
+    python storage.py import readings_history_backup.csv readings_history.csv
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+import argparse
+import csv
+import io
+import json
+import mmap
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+
+from history_cache import HistoryCache, COLUMNS, NUMERIC_COLUMNS, Reading, reading_to_dict, _to_epoch, _to_float
+from lease import FileLock
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv")
+CSV_FILE = "readings_history.csv"
+BACKUP_CSV_FILE = "readings_history_backup.csv"
+SQLITE_FILE = os.getenv("SQLITE_FILE", "readings.db")
+COLUMNAR_DIR = os.getenv("COLUMNAR_DIR", "readings_columns")
+PARTITION_DIR = os.getenv("PARTITION_DIR", "readings_partitions")
+PARTITION_BY = os.getenv("PARTITION_BY", "day")
+STORAGE_FSYNC = os.getenv("STORAGE_FSYNC", "batch")
+STORAGE_FSYNC_SECONDS = float(os.getenv("STORAGE_FSYNC_SECONDS", "60"))
+
+
+class BatchWriter:
+    """Rows queued during a scrape cycle, written together by flush()"""
+
+    def add(self, row):
+        """Queue one row (values in COLUMNS order, 'NA' for missing)"""
+        self._pending.append(list(row))
+
+    def flush(self):
+        """Write queued rows in one go; returns the rows written"""
+        rows, self._pending = self._pending, []
+        if rows:
+            self.write_rows(rows)
+        return rows
+
+    def discard(self):
+        """Drop queued rows without writing them; returns the rows dropped"""
+        rows, self._pending = self._pending, []
+        return rows
+
+
+def read_csv_rows(paths):
+    """
+    Rows (COLUMNS order, 'NA' for missing) from CSV history files in
+    timestamp order; old headers without the NPK columns are fine
+    """
+    rows = []
+    for path in paths:
+        with open(path, newline='', encoding='utf-8', errors='replace') as f:
+            for record in csv.DictReader(f):
+                record = {(k or '').strip(): v for k, v in record.items()}
+                if not record.get('timestamp_iso') or not record.get('sensor'):
+                    continue
+                rows.append([record.get(col) or 'NA' for col in COLUMNS])
+    rows.sort(key=lambda r: r[0])
+    return rows
+
+
+_last_fsync = {}
+
+
+def _maybe_fsync(f, path):
+    """fsync an open file according to STORAGE_FSYNC"""
+    if STORAGE_FSYNC == "off":
+        return
+    now = time.time()
+    if STORAGE_FSYNC == "interval" and now - _last_fsync.get(path, 0) < STORAGE_FSYNC_SECONDS:
+        return
+    f.flush()
+    os.fsync(f.fileno())
+    _last_fsync[path] = now
+
+
+def _trim_torn_tail(path):
+    """Cut a partial last line left by an interrupted append, so the next batch starts clean"""
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        start = max(0, size - 65536)
+        f.seek(start)
+        end = f.read(size - start).rfind(b"\n") + 1
+    os.truncate(path, start + end if end else 0)
+
+
+def append_csv_rows(path, rows):
+    """
+    Append rows (header first if the file is new) in a single write, so
+    readers see the batch at once, then fsync per STORAGE_FSYNC
+    """
+    if os.path.exists(path):
+        _trim_torn_tail(path)
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        writer.writerow(COLUMNS)
+    writer.writerows(rows)
+    data = memoryview(buf.getvalue().encode('utf-8'))
+    with open(path, 'ab', buffering=0) as f:
+        while data:
+            data = data[f.write(data):]
+        _maybe_fsync(f, path)
+
+
+# -------- CSV --------
+
+class CSVStorage(BatchWriter, HistoryCache):
+    name = "csv"
+
+    def __init__(self, path=CSV_FILE):
+        HistoryCache.__init__(self, path)
+        self._pending = []
+
+    def describe(self):
+        return self.path
+
+    def initialize(self):
+        """Ensure the CSV exists with headers"""
+        if not os.path.exists(self.path):
+            print(f"   [*] Initializing {self.path}...")
+        elif os.path.getsize(self.path) == 0:
+            print(f"   [*] CSV file empty, adding headers...")
+        else:
+            return
+        with open(self.path, 'w', newline='') as f:
+            csv.writer(f).writerow(COLUMNS)
+        print(f"   [OK] CSV initialized with headers")
+
+    def write_rows(self, rows):
+        # Scraper shards share the file; the lock keeps their batches whole
+        with FileLock(self.path + ".lock"):
+            append_csv_rows(self.path, rows)
+
+    def latest(self):
+        """Newest row per sensor, in file order"""
+        latest = {}
+        for row in self.rows():
+            latest[row.sensor] = row
+        return latest
+
+
+# -------- SQLITE --------
+
+_STATUS_COLUMNS = [c for c in COLUMNS if c not in NUMERIC_COLUMNS and c not in ('timestamp_iso', 'sensor')]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS readings (
+    id INTEGER PRIMARY KEY,
+    timestamp_iso TEXT NOT NULL,
+    sensor TEXT NOT NULL,
+    {', '.join(c + ' REAL' for c in COLUMNS if c in NUMERIC_COLUMNS)},
+    {', '.join(c + ' TEXT' for c in _STATUS_COLUMNS)},
+    epoch REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_readings_sensor_ts ON readings (sensor, timestamp_iso);
+CREATE INDEX IF NOT EXISTS idx_readings_ts ON readings (timestamp_iso);
+"""
+
+_SELECT = f"SELECT {', '.join(COLUMNS)}, epoch FROM readings"
+_INSERT = (f"INSERT OR IGNORE INTO readings ({', '.join(COLUMNS)}, epoch) "
+           f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})")
+
+
+def _row_values(row):
+    """Row in COLUMNS order ('NA' for missing) -> INSERT parameters"""
+    values = []
+    for col, value in zip(COLUMNS, row):
+        if col in NUMERIC_COLUMNS:
+            values.append(_to_float(str(value)))
+        else:
+            values.append(str(value) if value not in (None, '') else 'NA')
+    values.append(_to_epoch(values[0]))
+    return values
+
+
+class SQLiteStorage(BatchWriter):
+    """
+    Readings table in WAL mode so the server reads while the scraper writes.
+
+    Rows are never deleted, so the max rowid doubles as the row count and
+    rows_since() positions. PRAGMA user_version is the generation; the
+    importer bumps it so server-side caches start over.
+    """
+    name = "sqlite"
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self._pending = []
+        self._local = threading.local()
+        self._sensors = (None, [])
+
+    def describe(self):
+        return self.path
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def initialize(self):
+        self._conn()
+
+    def write_rows(self, rows):
+        conn = self._conn()
+        with conn:
+            conn.executemany(_INSERT, [_row_values(r) for r in rows])
+
+    # -------- READS --------
+
+    @staticmethod
+    def _where(since, until, sensor):
+        clauses, params = [], []
+        if sensor is not None:
+            clauses.append("sensor = ?")
+            params.append(sensor)
+        if since:
+            clauses.append("timestamp_iso >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp_iso <= ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _select(self, sql, params=(), with_epochs=False):
+        cursor = self._conn().execute(sql, params)
+        rows, epochs = [], []
+        for values in cursor:
+            rows.append(Reading(*values[:-1]))
+            epochs.append(values[-1])
+        return (rows, epochs) if with_epochs else rows
+
+    def rows(self):
+        return self._select(_SELECT + " ORDER BY id")
+
+    def query(self, since=None, until=None, sensor=None, with_epochs=False):
+        where, params = self._where(since, until, sensor)
+        return self._select(_SELECT + where + " ORDER BY timestamp_iso, id", params, with_epochs)
+
+    def count(self, since=None, until=None, sensor=None):
+        where, params = self._where(since, until, sensor)
+        return self._conn().execute("SELECT COUNT(*) FROM readings" + where, params).fetchone()[0]
+
+    def rows_since(self, seq, with_epochs=False):
+        result = self._select(_SELECT + " WHERE id > ? ORDER BY id", (seq,), with_epochs)
+        generation = self._generation()
+        if with_epochs:
+            return (generation,) + result
+        return generation, result
+
+    def _generation(self):
+        return self._conn().execute("PRAGMA user_version").fetchone()[0]
+
+    def version(self):
+        max_id = self._conn().execute("SELECT MAX(id) FROM readings").fetchone()[0]
+        return self._generation(), max_id or 0
+
+    def span(self, since=None, until=None, sensor=None):
+        """First and last timestamp a query would return (a cache key, like HistoryCache.span)"""
+        where, params = self._where(since, until, sensor)
+        conn = self._conn()
+        first = conn.execute(f"SELECT timestamp_iso FROM readings{where} ORDER BY timestamp_iso LIMIT 1", params).fetchone()
+        last = conn.execute(f"SELECT timestamp_iso FROM readings{where} ORDER BY timestamp_iso DESC LIMIT 1", params).fetchone()
+        return (first[0] if first else None, last[0] if last else None)
+
+    def bounds(self, sensor=None):
+        return self.span(sensor=sensor)
+
+    def sensors(self):
+        version = self.version()
+        if self._sensors[0] != version:
+            names = [r[0] for r in self._conn().execute("SELECT DISTINCT sensor FROM readings ORDER BY sensor")]
+            self._sensors = (version, names)
+        return self._sensors[1]
+
+    def latest(self):
+        """Newest row per sensor, by timestamp"""
+        latest = {}
+        for sensor in self.sensors():
+            rows = self._select(_SELECT + " WHERE sensor = ? ORDER BY timestamp_iso DESC, id DESC LIMIT 1", (sensor,))
+            if rows:
+                latest[sensor] = rows[0]
+        return latest
+
+    # -------- IMPORT --------
+
+    def import_csv(self, paths):
+        """Load CSV history files; rows already present are skipped, so re-running is safe"""
+        rows = read_csv_rows(paths)
+        conn = self._conn()
+        before = conn.total_changes
+        with conn:
+            conn.executemany(_INSERT, [_row_values(r) for r in rows])
+            conn.execute(f"PRAGMA user_version = {self._generation() + 1}")
+        return len(rows), conn.total_changes - before
+
+
+# -------- COLUMNAR --------
+
+COLUMNAR_META_FILE = "meta.json"
+_METRIC_COLUMNS = [c for c in COLUMNS if c in NUMERIC_COLUMNS]
+
+# column -> (file name, array typecode); every file holds one value per row
+COLUMNAR_LAYOUT = {'epoch': ('epoch.f8', 'd'), 'sensor': ('sensor.u2', 'H')}
+COLUMNAR_LAYOUT.update({c: (f'{c}.f8', 'd') for c in _METRIC_COLUMNS})
+COLUMNAR_LAYOUT.update({c: (f'{c}.u1', 'B') for c in _STATUS_COLUMNS})
+
+_NAN = float('nan')
+
+
+def _epoch_to_iso(epoch):
+    return datetime.fromtimestamp(epoch).isoformat(timespec='seconds')
+
+
+class ColumnarStorage(BatchWriter):
+    """
+    One fixed-width binary file per column in a directory:
+
+        epoch.f8       timestamp, seconds since the epoch (float64)
+        sensor.u2      sensor id (uint16) into meta.json "sensors"
+        <metric>.f8    reading from build_metrics (float64, NaN = missing)
+        <status>.u1    status code (uint8) into meta.json "statuses"
+
+    Readers mmap the files and bisect / scan the arrays in place; aggregate()
+    buckets a metric for /api/series without building rows. A row is
+    visible once every column holds it, so a half-finished append is never
+    read; the next append trims such a torn tail first. Rows are appended in
+    time order (the scraper writes "now", the importer sorts); if that ever
+    breaks, queries fall back to a scan and sort.
+    """
+    name = "columnar"
+
+    def __init__(self, path=COLUMNAR_DIR):
+        self.path = path
+        self._pending = []
+        self._lock = threading.RLock()
+        self._meta = {'generation': 0, 'sensors': [], 'statuses': []}
+        self._meta_mtime = None
+        self._sizes = None
+        self._views = {}
+        self._count = 0
+        self._checked = 0
+        self._sorted = True
+        # Sensor ids present in the mapped rows, extended as rows are appended
+        self._present = set()
+
+    def describe(self):
+        return self.path
+
+    def _file(self, col):
+        return os.path.join(self.path, COLUMNAR_LAYOUT[col][0])
+
+    def initialize(self):
+        os.makedirs(self.path, exist_ok=True)
+        for col in COLUMNAR_LAYOUT:
+            if not os.path.exists(self._file(col)):
+                open(self._file(col), 'ab').close()
+        if not os.path.exists(os.path.join(self.path, COLUMNAR_META_FILE)):
+            self._save_meta()
+
+    # -------- META --------
+
+    def _load_meta(self):
+        meta_path = os.path.join(self.path, COLUMNAR_META_FILE)
+        try:
+            mtime = os.path.getmtime(meta_path)
+        except OSError:
+            return
+        if mtime != self._meta_mtime:
+            with open(meta_path, 'r') as f:
+                self._meta = json.load(f)
+            self._meta_mtime = mtime
+
+    def _save_meta(self, directory=None):
+        meta_path = os.path.join(directory or self.path, COLUMNAR_META_FILE)
+        tmp = meta_path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self._meta, f)
+        os.replace(tmp, meta_path)
+        if directory is None:
+            self._meta_mtime = os.path.getmtime(meta_path)
+
+    def _code(self, table, value):
+        """Id of value in a meta table, appending it if new; returns (id, added)"""
+        values = self._meta[table]
+        if value in values:
+            return values.index(value), False
+        values.append(value)
+        return len(values) - 1, True
+
+    # -------- MAPPING --------
+
+    def refresh(self):
+        """Re-map the columns when the files grew or were replaced"""
+        with self._lock:
+            # Sizes before meta: the writer saves meta before appending rows that need it
+            try:
+                sizes = tuple(os.path.getsize(self._file(col)) for col in COLUMNAR_LAYOUT)
+            except OSError:
+                sizes = None
+
+            generation = self._meta['generation']
+            self._load_meta()
+            if self._meta['generation'] != generation:
+                self._sizes = None
+                self._checked = 0
+                self._sorted = True
+                self._present = set()
+            if sizes == self._sizes:
+                return
+            self._sizes = sizes
+            if sizes is None:
+                self._views, self._count = {}, 0
+                return
+
+            count = min(size // array(COLUMNAR_LAYOUT[col][1]).itemsize
+                        for col, size in zip(COLUMNAR_LAYOUT, sizes))
+            views = {}
+            for col, (_, typecode) in COLUMNAR_LAYOUT.items():
+                if count == 0:
+                    views[col] = memoryview(array(typecode))
+                    continue
+                with open(self._file(col), 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                # Old maps are left to the garbage collector: readers may still hold views
+                itemsize = array(typecode).itemsize
+                views[col] = memoryview(mm)[:count * itemsize].cast(typecode)
+            self._views, self._count = views, count
+
+            epochs = views['epoch']
+            for i in range(max(self._checked, 1), count):
+                if epochs[i] < epochs[i - 1]:
+                    self._sorted = False
+                    break
+            self._present.update(views['sensor'][self._checked:count])
+            self._checked = count
+
+    def _reading(self, i):
+        views, meta = self._views, self._meta
+        values = [_epoch_to_iso(views['epoch'][i]), meta['sensors'][views['sensor'][i]]]
+        for col in _METRIC_COLUMNS:
+            v = views[col][i]
+            values.append(None if v != v else v)
+        for col in _STATUS_COLUMNS:
+            values.append(meta['statuses'][views[col][i]])
+        return Reading(*values)
+
+    def _positions(self, since, until, sensor):
+        """Row positions in [since, until] for a sensor, in timestamp order"""
+        return self._epoch_positions(_to_epoch(since) if since else None,
+                                     _to_epoch(until) if until else None, sensor)
+
+    def _epoch_positions(self, start, end, sensor):
+        epochs = self._views.get('epoch', ())
+        if self._sorted:
+            lo = bisect_left(epochs, start) if start is not None else 0
+            hi = bisect_right(epochs, end) if end is not None else self._count
+            positions = range(lo, hi)
+        else:
+            positions = sorted(
+                (i for i in range(self._count)
+                 if (start is None or epochs[i] >= start) and (end is None or epochs[i] <= end)),
+                key=lambda i: epochs[i])
+        if sensor is None:
+            return positions
+        if sensor not in self._meta['sensors']:
+            return []
+        sid = self._meta['sensors'].index(sensor)
+        ids = self._views['sensor']
+        return [i for i in positions if ids[i] == sid]
+
+    # -------- READS --------
+
+    def rows(self):
+        self.refresh()
+        with self._lock:
+            return [self._reading(i) for i in range(self._count)]
+
+    def query(self, since=None, until=None, sensor=None, with_epochs=False):
+        self.refresh()
+        with self._lock:
+            positions = self._positions(since, until, sensor)
+            rows = [self._reading(i) for i in positions]
+            if with_epochs:
+                epochs = self._views['epoch'] if positions else ()
+                return rows, [epochs[i] for i in positions]
+            return rows
+
+    def count(self, since=None, until=None, sensor=None):
+        self.refresh()
+        with self._lock:
+            return len(self._positions(since, until, sensor))
+
+    def rows_since(self, seq, with_epochs=False):
+        self.refresh()
+        with self._lock:
+            generation = self._meta['generation']
+            positions = range(seq, self._count)
+            rows = [self._reading(i) for i in positions]
+            if with_epochs:
+                return generation, rows, list(self._views['epoch'][seq:self._count]) if rows else []
+            return generation, rows
+
+    def version(self):
+        self.refresh()
+        return self._meta['generation'], self._count
+
+    def span(self, since=None, until=None, sensor=None):
+        """Positional bounds of the time range (a cache key, like HistoryCache.span)"""
+        self.refresh()
+        with self._lock:
+            positions = self._positions(since, until, None)
+            return (positions[0], positions[-1]) if len(positions) else (None, None)
+
+    def sensors(self):
+        self.refresh()
+        with self._lock:
+            return sorted(self._meta['sensors'][i] for i in self._present)
+
+    def bounds(self, sensor=None):
+        self.refresh()
+        with self._lock:
+            positions = self._positions(None, None, sensor)
+            if not len(positions):
+                return None, None
+            epochs = self._views['epoch']
+            return _epoch_to_iso(epochs[positions[0]]), _epoch_to_iso(epochs[positions[-1]])
+
+    def latest(self):
+        """Newest row per sensor, scanning back from the end of the file"""
+        self.refresh()
+        with self._lock:
+            latest = {}
+            wanted = len(self._present)
+            ids = self._views.get('sensor', ())
+            for i in range(self._count - 1, -1, -1):
+                name = self._meta['sensors'][ids[i]]
+                if name not in latest:
+                    latest[name] = self._reading(i)
+                    if len(latest) == wanted:
+                        break
+            return latest
+
+    def epoch_bounds(self):
+        """(first, last) epoch, like BucketAggregates.epoch_bounds"""
+        self.refresh()
+        with self._lock:
+            positions = self._epoch_positions(None, None, None)
+            if not len(positions):
+                return None, None
+            epochs = self._views['epoch']
+            return epochs[positions[0]], epochs[positions[-1]]
+
+    def aggregate(self, sensor, field, width, since_epoch=None, until_epoch=None):
+        """
+        {"t", "min", "avg", "max"} per width-second bucket of one metric,
+        straight off the mapped columns (same shape as BucketAggregates.series)
+        """
+        self.refresh()
+        with self._lock:
+            out = {'t': [], 'min': [], 'avg': [], 'max': []}
+            start = since_epoch - since_epoch % width if since_epoch is not None else None
+            positions = self._epoch_positions(start, until_epoch, sensor)
+            if not len(positions):
+                return out
+            epochs, column = self._views['epoch'], self._views[field]
+
+            def emit(bucket, mn, mx, total, count):
+                out['t'].append(datetime.fromtimestamp(bucket).strftime('%Y-%m-%dT%H:%M:%S'))
+                out['min'].append(mn)
+                out['avg'].append(round(total / count, 3))
+                out['max'].append(mx)
+
+            bucket = mn = mx = None
+            total = count = 0
+            for i in positions:
+                v = column[i]
+                if v != v:
+                    continue
+                b = epochs[i] - epochs[i] % width
+                if b != bucket:
+                    if bucket is not None:
+                        emit(bucket, mn, mx, total, count)
+                    bucket, mn, mx, total, count = b, v, v, 0.0, 0
+                elif v < mn:
+                    mn = v
+                elif v > mx:
+                    mx = v
+                total += v
+                count += 1
+            if bucket is not None:
+                emit(bucket, mn, mx, total, count)
+            return out
+
+    # -------- WRITES --------
+
+    def _encode(self, rows):
+        """Column arrays for rows; updates meta tables, returns (arrays, meta_changed)"""
+        arrays = {col: array(typecode) for col, (_, typecode) in COLUMNAR_LAYOUT.items()}
+        changed = False
+        for row in rows:
+            epoch = _to_epoch(str(row[0]))
+            if epoch is None:
+                continue
+            sid, added = self._code('sensors', str(row[1]))
+            changed |= added
+            arrays['epoch'].append(epoch)
+            arrays['sensor'].append(sid)
+            for col, value in zip(COLUMNS, row):
+                if col in NUMERIC_COLUMNS:
+                    v = _to_float(str(value))
+                    arrays[col].append(_NAN if v is None else v)
+                elif col in _STATUS_COLUMNS:
+                    code, added = self._code('statuses', str(value) if value not in (None, '') else 'NA')
+                    changed |= added
+                    arrays[col].append(code)
+        return arrays, changed
+
+    def _append(self, directory, arrays):
+        for col, (filename, _) in COLUMNAR_LAYOUT.items():
+            path = os.path.join(directory, filename)
+            with open(path, 'ab') as f:
+                arrays[col].tofile(f)
+                _maybe_fsync(f, path)
+
+    def write_rows(self, rows):
+        # The file lock serializes scraper shards: meta ids and the torn-tail
+        # trim below are only safe with one writer at a time
+        with self._lock, FileLock(self.path.rstrip(os.sep) + ".lock"):
+            self.initialize()
+            self._load_meta()
+            arrays, changed = self._encode(rows)
+            # Ids must be resolvable before any row using them becomes visible
+            if changed:
+                self._save_meta()
+
+            # Trim a torn tail left by an interrupted append
+            sizes = [os.path.getsize(self._file(col)) for col in COLUMNAR_LAYOUT]
+            itemsizes = [array(typecode).itemsize for _, typecode in COLUMNAR_LAYOUT.values()]
+            count = min(size // itemsize for size, itemsize in zip(sizes, itemsizes))
+            for col, size, itemsize in zip(COLUMNAR_LAYOUT, sizes, itemsizes):
+                if size != count * itemsize:
+                    os.truncate(self._file(col), count * itemsize)
+
+            self._append(self.path, arrays)
+
+    def import_csv(self, paths):
+        """
+        Merge CSV history files with what is stored, de-duplicated on
+        (sensor, timestamp_iso) and sorted, into a freshly written directory
+        that replaces the old one; bumps the generation. Holds the writers'
+        file lock throughout, so no flush lands in the retired directory.
+        """
+        with self._lock, FileLock(self.path.rstrip(os.sep) + ".lock"):
+            self.initialize()
+            self.refresh()
+            existing = [list(r) for r in self.rows()]
+            seen = {(r[1], r[0]) for r in existing}
+            merged = list(existing)
+            imported = read_csv_rows(paths)
+            read = len(imported)
+            for row in imported:
+                if (row[1], row[0]) not in seen:
+                    seen.add((row[1], row[0]))
+                    merged.append(row)
+            merged.sort(key=lambda r: r[0])
+
+            staging = self.path + ".importing"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            self._meta = {'generation': self._meta['generation'] + 1, 'sensors': [], 'statuses': []}
+            arrays, _ = self._encode(merged)
+            self._append(staging, arrays)
+            self._save_meta(staging)
+
+            # Swap directories; open maps of the old files stay valid for their readers
+            retired = self.path + ".old"
+            shutil.rmtree(retired, ignore_errors=True)
+            os.replace(self.path, retired)
+            os.replace(staging, self.path)
+            shutil.rmtree(retired, ignore_errors=True)
+            self._meta_mtime = None
+            self.refresh()
+            return read, len(merged) - len(existing)
+
+
+# -------- PARTITIONED CSV --------
+
+PARTITION_MANIFEST = "manifest.json"
+_PARTITION_KEY_LENGTH = {'day': 10, 'month': 7}
+
+
+class PartitionedStorage(BatchWriter):
+    """
+    CSV history split by day (or month, PARTITION_BY) into one file per
+    partition, described by manifest.json:
+
+        {"generation": 0, "partition_by": "day",
+         "partitions": {"2026-02-09": {"file": "readings-2026-02-09.csv", "rows": 288,
+                                       "first": "...", "last": "...", "sensors": [...]}}}
+
+    A flush groups its rows by partition, appends each group in one write
+    and then rewrites the manifest, all under one file lock. Readers go by
+    the manifest: queries only open the partitions whose [first, last]
+    overlaps the range, and rows_since() skips whole partitions by their row
+    counts, so following new rows only touches the newest file. Opened
+    partitions are HistoryCache objects, tail-read incrementally.
+
+    Row positions run through the partitions in key order, so rows written
+    into an older partition (replayed or imported history) bump the generation.
+    """
+    name = "partitioned"
+
+    def __init__(self, path=PARTITION_DIR, partition_by=PARTITION_BY):
+        if partition_by not in _PARTITION_KEY_LENGTH:
+            raise ValueError(f"PARTITION_BY must be one of: {', '.join(_PARTITION_KEY_LENGTH)}")
+        self.path = path
+        self._pending = []
+        self._lock = threading.RLock()
+        self._manifest = {'generation': 0, 'partition_by': partition_by, 'partitions': {}}
+        self._manifest_stat = None
+        self._caches = {}
+
+    def describe(self):
+        return self.path
+
+    def _manifest_file(self):
+        return os.path.join(self.path, PARTITION_MANIFEST)
+
+    def initialize(self):
+        os.makedirs(self.path, exist_ok=True)
+        if not os.path.exists(self._manifest_file()):
+            self._save_manifest()
+
+    # -------- MANIFEST --------
+
+    def _load_manifest(self):
+        """Re-read the manifest when the writer replaced it"""
+        try:
+            st = os.stat(self._manifest_file())
+        except OSError:
+            return
+        if (st.st_ino, st.st_mtime_ns) == self._manifest_stat:
+            return
+        try:
+            with open(self._manifest_file(), 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        if manifest.get('generation') != self._manifest['generation']:
+            self._caches = {}
+        self._manifest = manifest
+        self._manifest_stat = (st.st_ino, st.st_mtime_ns)
+
+    def _save_manifest(self):
+        tmp = self._manifest_file() + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self._manifest, f, indent=1)
+        os.replace(tmp, self._manifest_file())
+        st = os.stat(self._manifest_file())
+        self._manifest_stat = (st.st_ino, st.st_mtime_ns)
+
+    def _partitions(self):
+        """[(key, entry)] in key (= time) order"""
+        return sorted(self._manifest['partitions'].items())
+
+    def _cache(self, key):
+        cache = self._caches.get(key)
+        if cache is None:
+            entry = self._manifest['partitions'][key]
+            cache = self._caches[key] = HistoryCache(os.path.join(self.path, entry['file']))
+        return cache
+
+    def _overlapping(self, since, until, sensor=None):
+        return [key for key, entry in self._partitions()
+                if entry['rows']
+                and (not since or entry['last'] >= since)
+                and (not until or entry['first'] <= until)
+                and (sensor is None or sensor in entry['sensors'])]
+
+    # -------- READS --------
+
+    def refresh(self):
+        with self._lock:
+            self._load_manifest()
+
+    def rows(self):
+        with self._lock:
+            self._load_manifest()
+            rows = []
+            for key, entry in self._partitions():
+                rows.extend(self._cache(key).rows()[:entry['rows']])
+            return rows
+
+    def query(self, since=None, until=None, sensor=None, with_epochs=False):
+        with self._lock:
+            self._load_manifest()
+            rows, epochs = [], []
+            for key in self._overlapping(since, until, sensor):
+                part_rows, part_epochs = self._cache(key).query(since, until, sensor, with_epochs=True)
+                rows.extend(part_rows)
+                epochs.extend(part_epochs)
+            return (rows, epochs) if with_epochs else rows
+
+    def count(self, since=None, until=None, sensor=None):
+        with self._lock:
+            self._load_manifest()
+            return sum(self._cache(key).count(since, until, sensor)
+                       for key in self._overlapping(since, until, sensor))
+
+    def rows_since(self, seq, with_epochs=False):
+        with self._lock:
+            self._load_manifest()
+            rows, epochs = [], []
+            start = 0
+            for key, entry in self._partitions():
+                end = start + entry['rows']
+                if end > seq:
+                    # Capped at the manifest count so positions match version()
+                    _, part_rows, part_epochs = self._cache(key).rows_since(max(seq - start, 0), with_epochs=True)
+                    keep = end - max(seq, start)
+                    rows.extend(part_rows[:keep])
+                    epochs.extend(part_epochs[:keep])
+                start = end
+            generation = self._manifest['generation']
+            return (generation, rows, epochs) if with_epochs else (generation, rows)
+
+    def version(self):
+        with self._lock:
+            self._load_manifest()
+            return (self._manifest['generation'],
+                    sum(entry['rows'] for entry in self._manifest['partitions'].values()))
+
+    def span(self, since=None, until=None, sensor=None):
+        """Per overlapping partition, the bounds a query would select (a cache key, like HistoryCache.span)"""
+        with self._lock:
+            self._load_manifest()
+            return tuple((key, self._cache(key).span(since, until, sensor))
+                         for key in self._overlapping(since, until, sensor))
+
+    def sensors(self):
+        with self._lock:
+            self._load_manifest()
+            return sorted({s for entry in self._manifest['partitions'].values() for s in entry['sensors']})
+
+    def bounds(self, sensor=None):
+        with self._lock:
+            self._load_manifest()
+            keys = self._overlapping(None, None, sensor)
+            if not keys:
+                return (None, None)
+            if sensor is None:
+                partitions = self._manifest['partitions']
+                return partitions[keys[0]]['first'], partitions[keys[-1]]['last']
+            return self._cache(keys[0]).bounds(sensor)[0], self._cache(keys[-1]).bounds(sensor)[1]
+
+    def latest(self):
+        """Newest row per sensor, reading back from the newest partition"""
+        with self._lock:
+            self._load_manifest()
+            wanted = set(self.sensors())
+            latest = {}
+            for key in reversed(self._overlapping(None, None)):
+                for row in reversed(self._cache(key).rows()):
+                    if row.sensor not in latest:
+                        latest[row.sensor] = row
+                if wanted <= set(latest):
+                    break
+            return latest
+
+    # -------- WRITES --------
+
+    def _key(self, timestamp):
+        return str(timestamp)[:_PARTITION_KEY_LENGTH[self._manifest['partition_by']]]
+
+    def _refresh_entry(self, key):
+        """Manifest entry from the partition file itself, so a crash between append and manifest heals"""
+        cache = self._cache(key)
+        entry = self._manifest['partitions'][key]
+        entry['rows'] = len(cache.rows())
+        entry['first'], entry['last'] = cache.bounds()
+        entry['sensors'] = cache.sensors()
+
+    def _group(self, rows):
+        """{partition key: rows}, skipping rows whose timestamp doesn't parse (they have no partition)"""
+        groups = {}
+        for row in rows:
+            if _to_epoch(str(row[0])) is not None:
+                groups.setdefault(self._key(row[0]), []).append(row)
+        return groups
+
+    def _entry(self, key):
+        partitions = self._manifest['partitions']
+        if key not in partitions:
+            partitions[key] = {'file': f"readings-{key}.csv", 'rows': 0,
+                               'first': None, 'last': None, 'sensors': []}
+        return partitions[key]
+
+    def write_rows(self, rows):
+        with self._lock, FileLock(self.path.rstrip(os.sep) + ".lock"):
+            self.initialize()
+            self._load_manifest()
+            newest = max(self._manifest['partitions'], default=None)
+
+            groups = self._group(rows)
+            if not groups:
+                return
+            for key in sorted(groups):
+                entry = self._entry(key)
+                append_csv_rows(os.path.join(self.path, entry['file']), groups[key])
+                self._refresh_entry(key)
+
+            if newest is not None and min(groups) < newest:
+                self._manifest['generation'] += 1
+                self._caches = {}
+            self._save_manifest()
+
+    def import_csv(self, paths):
+        """
+        Merge CSV history files into their partitions, de-duplicated on
+        (sensor, timestamp_iso) and sorted; rewritten partitions replace the
+        old files and the generation is bumped. Returns (read, inserted).
+        """
+        imported = read_csv_rows(paths)
+        with self._lock, FileLock(self.path.rstrip(os.sep) + ".lock"):
+            self.initialize()
+            self._load_manifest()
+            groups = self._group(imported)
+
+            inserted = 0
+            for key in sorted(groups):
+                entry = self._entry(key)
+                existing = [[d[c] for c in COLUMNS] for d in map(reading_to_dict, self._cache(key).rows())]
+                seen = {(r[1], r[0]) for r in existing}
+                merged = list(existing)
+                for row in groups[key]:
+                    if (row[1], row[0]) not in seen:
+                        seen.add((row[1], row[0]))
+                        merged.append(row)
+                inserted += len(merged) - len(existing)
+                merged.sort(key=lambda r: r[0])
+
+                path = os.path.join(self.path, entry['file'])
+                tmp = path + ".importing"
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                append_csv_rows(tmp, merged)
+                os.replace(tmp, path)
+                self._caches.pop(key, None)
+                self._refresh_entry(key)
+
+            self._manifest['generation'] += 1
+            self._caches = {}
+            self._save_manifest()
+        return len(imported), inserted
+
+
+# -------- FACTORY --------
+
+BACKENDS = {
+    'csv': CSVStorage,
+    'sqlite': SQLiteStorage,
+    'columnar': ColumnarStorage,
+    'partitioned': PartitionedStorage,
+}
+
+
+def open_storage(backend=None):
+    backend = backend or STORAGE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', use one of: {', '.join(BACKENDS)}")
+    return BACKENDS[backend]()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Import CSV history into the SQLite, columnar or partitioned store")
+    imp.add_argument("csv_files", nargs="*", default=[BACKUP_CSV_FILE, CSV_FILE],
+                     help=f"CSV files to import (default: {BACKUP_CSV_FILE} {CSV_FILE})")
+    imp.add_argument("--backend", "-b", choices=["sqlite", "columnar", "partitioned"], default="sqlite",
+                     help="Store to import into (default: sqlite)")
+    imp.add_argument("--path", default=None,
+                     help=f"Database file or directory (default: {SQLITE_FILE} / {COLUMNAR_DIR} / {PARTITION_DIR})")
+    args = parser.parse_args()
+
+    paths = [p for p in args.csv_files if os.path.exists(p)]
+    if not paths:
+        print("[!] No CSV files found to import")
+        sys.exit(1)
+
+    backend = BACKENDS[args.backend]
+    store = backend(args.path) if args.path else backend()
+    read, inserted = store.import_csv(paths)
+    print(f"[OK] Imported {inserted} new row(s) of {read} read from {', '.join(paths)} into {store.describe()}")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Check /api/history cursors: deltas after appends, resets after truncation and bad cursors"""
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+workdir = tempfile.mkdtemp()
+os.chdir(workdir)
+os.environ["STORAGE_BACKEND"] = "csv"
+os.environ["SERVE_ONLY"] = "1"
+
+from history_cache import COLUMNS
+
+START = datetime(2026, 2, 20)
+
+
+def reading(i, sensor):
+    row = dict.fromkeys(COLUMNS, "NA")
+    row.update(timestamp_iso=(START + timedelta(minutes=10 * i)).isoformat(),
+               sensor=sensor, temperature_c=str(20 + i % 5))
+    return [row[c] for c in COLUMNS]
+
+
+def write_history(rows, mode="w"):
+    with open("readings_history.csv", mode, newline="") as f:
+        writer = csv.writer(f)
+        if mode == "w":
+            writer.writerow(COLUMNS)
+        writer.writerows(rows)
+
+
+failures = 0
+
+
+def check(ok, message):
+    global failures
+    if ok:
+        print(f"[OK] {message}")
+    else:
+        failures += 1
+        print(f"[!] FAILED: {message}")
+
+
+write_history([reading(i, "Sensor 1" if i % 2 else "Sensor 2") for i in range(10)])
+
+import server
+
+client = server.app.test_client()
+
+print("[*] Cursor encoding...")
+check(server.decode_cursor(server.encode_cursor(3, 1234)) == (3, 1234), "cursor round-trips")
+check(client.get("/api/history?cursor=not-a-cursor").status_code == 400, "a malformed cursor is rejected with 400")
+
+print("[*] First fetch...")
+data = client.get("/api/history?cursor=").get_json()
+check(data["reset"] and len(data["rows"]) == 10, "an empty cursor returns everything with reset=true")
+cursor = data["cursor"]
+
+again = client.get(f"/api/history?cursor={cursor}").get_json()
+check(not again["reset"] and again["rows"] == [] and again["cursor"] == cursor,
+      "a current cursor with nothing new returns no rows")
+
+print("[*] Appending rows...")
+write_history([reading(i, "Sensor 2") for i in range(10, 13)], mode="a")
+delta = client.get(f"/api/history?cursor={cursor}").get_json()
+check(not delta["reset"] and [r["timestamp_iso"] for r in delta["rows"]] ==
+      [(START + timedelta(minutes=10 * i)).isoformat() for i in range(10, 13)],
+      "a current cursor returns only the appended rows, in order")
+sensor_delta = client.get(f"/api/history/Sensor 1?cursor={cursor}").get_json()
+check(sensor_delta["rows"] == [] and not sensor_delta["reset"], "per-sensor deltas only carry that sensor's rows")
+cursor = delta["cursor"]
+
+print("[*] Truncating the history...")
+write_history([reading(i, "Sensor 2") for i in range(4)])
+reset = client.get(f"/api/history?cursor={cursor}").get_json()
+check(reset["reset"] and len(reset["rows"]) == 4, "a cursor from before a truncation gets a full reset")
+check(server.decode_cursor(reset["cursor"])[0] > server.decode_cursor(cursor)[0], "the new cursor carries the new generation")
+
+generation, _ = server.decode_cursor(reset["cursor"])
+ahead = client.get(f"/api/history?cursor={server.encode_cursor(generation, 99)}").get_json()
+check(ahead["reset"] and len(ahead["rows"]) == 4, "a cursor past the end of the current generation gets a reset")
+
+os.chdir(HERE)
+shutil.rmtree(workdir, ignore_errors=True)
+if failures:
+    sys.exit(1)
+print("\n[OK] History cursors follow appends and truncation")
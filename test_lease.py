@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""Check scraper lease claiming, expiry takeover, token fencing on renewal and release"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from lease import ScraperLease, read_lease
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+failures = 0
+
+
+def check(ok, message):
+    global failures
+    if ok:
+        print(f"[OK] {message}")
+    else:
+        failures += 1
+        print(f"[!] FAILED: {message}")
+
+
+workdir = tempfile.mkdtemp()
+path = os.path.join(workdir, "scraper.lease")
+clock = Clock()
+# Heartbeats are driven by hand below, so the background threads just wait
+a = ScraperLease(path, ttl=90, heartbeat=3600, clock=clock)
+b = ScraperLease(path, ttl=90, heartbeat=3600, clock=clock)
+
+try:
+    print("[*] Claiming a free lease...")
+    check(a.try_acquire() and a.held(), "first contender holds the lease")
+    check(read_lease(path)['token'] == 1, "first claim has token 1")
+    check(not b.try_acquire(), "second contender stands by while the lease is fresh")
+
+    print("[*] Renewing within the TTL...")
+    clock.now += 60
+    check(a._renew(), "holder renews")
+    clock.now += 60
+    check(not b.try_acquire(), "renewed lease is not taken over 120s after the claim")
+
+    print("[*] Expiring the holder's heartbeat...")
+    clock.now += 91
+    check(b.try_acquire(), "stale lease is taken over after the TTL")
+    check(read_lease(path)['token'] == 2, "takeover bumps the token")
+    check(not a._renew(), "old holder's renewal is refused")
+
+    # The old holder's heartbeat loop notices and stands down
+    a._stop.set()
+    a._thread.join()
+    a._stop.clear()
+    a.heartbeat = 0.01
+    loop = threading.Thread(target=a._run_heartbeat, daemon=True)
+    loop.start()
+    loop.join(5)
+    check(not loop.is_alive() and not a.held(), "old holder stops claiming to hold the lease")
+
+    print("[*] Fencing on the token...")
+    lease = read_lease(path)
+    lease['token'] += 1
+    with open(path, "w") as f:
+        json.dump(lease, f)
+    check(not b._renew(), "renewal with a superseded token is refused, even for the same owner")
+    lease['token'] -= 1
+    with open(path, "w") as f:
+        json.dump(lease, f)
+    check(b._renew(), "renewal with the current token succeeds")
+
+    print("[*] Releasing...")
+    b.release()
+    check(not b.held(), "released lease is no longer held")
+    c = ScraperLease(path, ttl=90, heartbeat=3600, clock=clock)
+    check(c.try_acquire(), "standby takes a released lease at once")
+    check(read_lease(path)['token'] == 3, "takeover after release bumps the token")
+    c.release()
+finally:
+    a.release()
+    b.release()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if failures:
+    sys.exit(1)
+print("\n[OK] Scraper lease hands over correctly")
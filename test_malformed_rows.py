@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""Check that a history row with an unparseable timestamp doesn't break the stats and series APIs"""
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+workdir = tempfile.mkdtemp()
+os.chdir(workdir)
+os.environ["STORAGE_BACKEND"] = "csv"
+os.environ["SERVE_ONLY"] = "1"
+
+from history_cache import COLUMNS
+
+print("[*] Writing history with one malformed timestamp...")
+start = datetime(2026, 2, 20)
+with open("readings_history.csv", "w", newline="") as f:
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    for i in range(200):
+        row = dict.fromkeys(COLUMNS, "NA")
+        row.update(timestamp_iso=(start + timedelta(minutes=10 * i)).isoformat(),
+                   sensor="Sensor 2", temperature_c=str(20 + i % 5), moisture_pct=str(40 + i % 9))
+        writer.writerow([row[c] for c in COLUMNS])
+    row = dict.fromkeys(COLUMNS, "NA")
+    row.update(timestamp_iso="24/02/2026 13:20", sensor="Sensor 2", temperature_c="21")
+    writer.writerow([row[c] for c in COLUMNS])
+
+import server
+
+client = server.app.test_client()
+failures = 0
+for url in ["/api/stats", "/api/series?method=minmax", "/api/series?method=lttb"]:
+    response = client.get(url)
+    if response.status_code == 200:
+        print(f"[OK] {url} -> 200")
+    else:
+        failures += 1
+        print(f"[!] {url} -> {response.status_code}")
+
+stats = client.get("/api/stats").get_json()["stats"].get("Sensor 2", {})
+count = stats.get("temperature_c", {}).get("count")
+if count == 200:
+    print("[OK] Malformed row skipped by the rolling stats (200 readings folded)")
+else:
+    failures += 1
+    print(f"[!] Expected 200 temperature readings in /api/stats, got {count}")
+
+os.chdir(HERE)
+shutil.rmtree(workdir, ignore_errors=True)
+if failures:
+    sys.exit(1)
+print("\n[OK] Malformed history rows are handled")
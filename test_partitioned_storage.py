@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""Check batched writes, discard on lease loss and partition routing of the partitioned backend"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+workdir = tempfile.mkdtemp()
+os.chdir(workdir)
+
+from history_cache import COLUMNS
+from storage import PartitionedStorage, append_csv_rows
+import monitor
+
+
+def reading(ts, sensor="Sensor 2", temperature="21"):
+    row = dict.fromkeys(COLUMNS, "NA")
+    row.update(timestamp_iso=ts, sensor=sensor, temperature_c=temperature)
+    return [row[c] for c in COLUMNS]
+
+
+failures = 0
+
+
+def check(ok, message):
+    global failures
+    if ok:
+        print(f"[OK] {message}")
+    else:
+        failures += 1
+        print(f"[!] FAILED: {message}")
+
+
+print("[*] Batching...")
+store = PartitionedStorage(os.path.join(workdir, "daily"), partition_by="day")
+store.add(reading("2026-02-09T23:50:00"))
+store.add(reading("2026-02-10T00:00:00", "Sensor 1"))
+check(store.version() == (0, 0), "queued rows are not visible before flush")
+written = store.flush()
+check(len(written) == 2 and store.version() == (0, 2), "flush writes the whole batch")
+check(store.flush() == [], "a second flush has nothing to write")
+
+print("[*] Partition routing...")
+partitions = store._manifest['partitions']
+check(sorted(partitions) == ["2026-02-09", "2026-02-10"], "rows land in their day's partition")
+check(partitions["2026-02-10"]["sensors"] == ["Sensor 1"], "the manifest lists each partition's sensors")
+check([r.sensor for r in store.query(since="2026-02-10T00:00:00")] == ["Sensor 1"],
+      "a range query only returns rows from the partitions it overlaps")
+
+monthly = PartitionedStorage(os.path.join(workdir, "monthly"), partition_by="month")
+monthly.write_rows([reading("2026-02-09T23:50:00"), reading("2026-03-01T00:00:00")])
+check(sorted(monthly._manifest['partitions']) == ["2026-02", "2026-03"], "PARTITION_BY=month routes by month")
+
+try:
+    PartitionedStorage(os.path.join(workdir, "weekly"), partition_by="week")
+    check(False, "an unknown PARTITION_BY is rejected")
+except ValueError:
+    check(True, "an unknown PARTITION_BY is rejected")
+
+print("[*] Following new rows...")
+generation, seq = store.version()
+store.write_rows([reading("2026-02-10T00:10:00")])
+_, new_rows = store.rows_since(seq)
+check(store.version() == (generation, 3) and [r.timestamp_iso for r in new_rows] == ["2026-02-10T00:10:00"],
+      "appending to the newest partition keeps the generation; rows_since returns the new row")
+store.write_rows([reading("2026-02-08T12:00:00")])
+check(store.version()[0] == generation + 1, "a row written into an older partition bumps the generation")
+check(len(store.rows()) == 4 and store.bounds() == ("2026-02-08T12:00:00", "2026-02-10T00:10:00"),
+      "rows and bounds run through the partitions in time order")
+
+print("[*] Malformed timestamps and torn tails...")
+store.write_rows([reading("24/02/2026 13:20")])
+check(store.version()[1] == 4 and not any("/" in key for key in store._manifest['partitions']),
+      "a row with an unparseable timestamp is skipped, not given a partition")
+path = os.path.join(store.path, store._manifest['partitions']["2026-02-10"]["file"])
+with open(path, "a") as f:
+    f.write("2026-02-10T00:20:00,Sens")
+append_csv_rows(path, [reading("2026-02-10T00:30:00")])
+check([r.timestamp_iso for r in store._cache("2026-02-10").rows()][-1] == "2026-02-10T00:30:00"
+      and len(store._cache("2026-02-10").rows()) == 3, "a torn tail is trimmed before the next append")
+
+print("[*] Discarding on lease loss...")
+
+class LostLease:
+    def held(self):
+        return False
+
+
+monitor._storage = PartitionedStorage(os.path.join(workdir, "leased"))
+monitor._scraper_lease = LostLease()
+monitor.save_reading("Sensor 2", {'temperature_c': 21.0, 'moisture_pct': 40.0},
+                     timestamp="2026-02-11T00:00:00")
+check(monitor.flush_readings() == [], "flush_readings writes nothing once the lease is lost")
+check(monitor._storage.version() == (0, 0) and monitor._storage._pending == [],
+      "the queued rows are dropped, not kept for the next holder")
+monitor._scraper_lease = None
+
+os.chdir(HERE)
+shutil.rmtree(workdir, ignore_errors=True)
+if failures:
+    sys.exit(1)
+print("\n[OK] Partitioned storage batches and routes rows correctly")
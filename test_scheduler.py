@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""Check scheduler slot alignment, jitter offsets, missed-slot counting, retry backoff and skips"""
+
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from scheduler import Scheduler
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+failures = 0
+
+
+def check(ok, message):
+    global failures
+    if ok:
+        print(f"[OK] {message}")
+    else:
+        failures += 1
+        print(f"[!] FAILED: {message}")
+
+
+INTERVAL = 600.0
+NAMES = ["Sensor 1", "Sensor 2", "Sensor 3"]
+
+print("[*] Jitter offsets...")
+clock = Clock(1_000_000.0)
+sched = Scheduler({name: INTERVAL for name in NAMES}, jitter=30, retry_base=30, clock=clock)
+offsets = {name: job.offset for name, job in sched.jobs.items()}
+check(all(0 <= o < 30 for o in offsets.values()), "offsets fall within the jitter")
+check(len(set(offsets.values())) == len(NAMES), "dashboards sharing an interval get different offsets")
+again = Scheduler({name: INTERVAL for name in NAMES}, jitter=30, clock=Clock(5.0))
+check({n: j.offset for n, j in again.jobs.items()} == offsets, "offsets are stable across restarts")
+short = Scheduler({"Sensor 1": 60}, jitter=30, clock=clock)
+check(short.jobs["Sensor 1"].offset < 15, "offset never exceeds a quarter interval")
+
+print("[*] First run and slot alignment...")
+check(sorted(sched.due()) == NAMES, "start_now makes every job due at once")
+later = Scheduler({"Sensor 1": INTERVAL}, jitter=30, start_now=False, clock=clock)
+check(later.due() == [] and later.next_wakeup() > clock.now, "without start_now the first run waits for its slot")
+clock.now += 20
+sched.record("Sensor 1", True)
+job = sched.jobs["Sensor 1"]
+check((job.next_due - job.offset) % INTERVAL == 0 and job.next_due > clock.now,
+      "after a run the next one is at the following aligned slot")
+check(job.next_due - clock.now <= INTERVAL, "a run shorter than the interval keeps the fixed rate")
+
+print("[*] Overrunning slots...")
+offset = offsets["Sensor 2"]
+clock = Clock(offset + 100 * INTERVAL)
+sched = Scheduler({"Sensor 2": INTERVAL}, jitter=30, retry_base=30, clock=clock)
+clock.now += 3.5 * INTERVAL
+sched.record("Sensor 2", True)
+job = sched.jobs["Sensor 2"]
+check(job.skipped == 3, f"a run lasting 3.5 intervals counts 3 missed slots (got {job.skipped})")
+check(job.next_due == offset + 104 * INTERVAL, "and continues at the next slot after now")
+check(sched.stats() == {'runs': 1, 'errors': 0, 'skipped': 3}, "stats add up runs, errors and skipped slots")
+
+print("[*] Retry backoff...")
+start = clock.now = job.next_due
+waits = []
+for _ in range(4):
+    sched.record("Sensor 2", False)
+    waits.append(job.next_due - clock.now)
+    clock.now = job.next_due
+check(waits[:3] == [30, 60, 120], f"failures back off exponentially (got {waits[:3]})")
+check(job.next_due <= start + INTERVAL, "a retry is never later than the next regular slot")
+check(job.skipped == 3, "retries within the interval don't count as missed slots")
+sched.record("Sensor 2", True)
+check(job.failures == 0 and job.next_due == start + INTERVAL, "success resets the backoff")
+
+print("[*] Skipping a run...")
+clock.now = job.next_due
+runs = job.runs
+sched.skip("Sensor 2")
+check(job.runs == runs and job.next_due == start + 2 * INTERVAL,
+      "a skipped run isn't counted and waits for the next slot")
+
+if failures:
+    sys.exit(1)
+print("\n[OK] Scheduler keeps its fixed rate")